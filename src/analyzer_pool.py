@@ -0,0 +1,203 @@
+# src/analyzer_pool.py
+import collections, itertools, queue, sys, threading, time
+import multiprocessing as mp
+from event_channel import parse_line
+
+class _QueueWriter:
+    """stdout do worker: cada linha impressa pelo analisador vira uma mensagem para a API"""
+    def __init__(self, out_q, name, job_id):
+        self.out_q = out_q
+        self.name = name
+        self.job_id = job_id
+        self.buf = ""
+
+    def write(self, text):
+        self.buf += text
+        while "\n" in self.buf:
+            line, self.buf = self.buf.split("\n", 1)
+            self.out_q.put((self.name, self.job_id, "line", line + "\n"))
+        return len(text)
+
+    def flush(self):
+        if self.buf:
+            self.out_q.put((self.name, self.job_id, "line", self.buf + "\n"))
+            self.buf = ""
+
+def _worker_main(name, job_q, out_q, backend, int8):
+    # Carrega o modelo uma única vez; ele fica residente enquanto o worker viver
+    from mvp_store_ai import build_arg_parser, analyze_video, load_pose_model
+    from event_channel import QueueChannel, set_channel
+    model = load_pose_model(backend, int8)
+    out_q.put((name, None, "ready", None))
+    real_stdout = sys.stdout
+    while True:
+        job = job_q.get()
+        if job is None:
+            break
+        job_id, argv = job
+        # Registros (eventos, stats, fim) vão como dicts; prints avulsos continuam como linhas
+        sys.stdout = _QueueWriter(out_q, name, job_id)
+        set_channel(QueueChannel(out_q, name, job_id))
+        returncode = 0
+        try:
+            analyze_video(build_arg_parser().parse_args(argv), model=model)
+        except BaseException as e:
+            print(f"[ERRO] Falha na análise: {e}")
+            returncode = 1
+        finally:
+            set_channel(None)
+            sys.stdout.flush()
+            sys.stdout = real_stdout
+        out_q.put((name, job_id, "done", returncode))
+
+class AnalysisJob:
+    """Análise enfileirada no pool: registros do event_channel (records), wait e returncode"""
+    def __init__(self, job_id, argv):
+        self.job_id = job_id
+        self.argv = argv
+        self.q = queue.Queue()
+        self.returncode = None
+        self._done = threading.Event()
+
+    def records(self):
+        """Registros da análise até o fim do job (linhas soltas do stdout viram registros de log)"""
+        while True:
+            record = self.q.get()
+            if record is None:
+                return
+            yield record
+
+    def wait(self, timeout=None):
+        self._done.wait(timeout)
+        return self.returncode
+
+class AnalyzerPool:
+    """Pool de processos analisadores de longa duração, iniciado junto com a API.
+
+    Cada worker carrega o YOLO uma vez e atende análises enviadas pela API por uma fila local,
+    evitando iniciar interpretador, importar torch/ultralytics e carregar o modelo a cada
+    requisição. O número de workers limita quantas cópias do modelo ficam na memória.
+    backend/int8 escolhem o runtime do modelo (ver pose_model.load_pose_model).
+    A API distribui os jobs (um por worker ocioso), então sabe qual job um worker
+    estava executando se ele morrer.
+    """
+    def __init__(self, size=1, backend="auto", int8=False):
+        self.ctx = mp.get_context("spawn")
+        self.size = max(1, size)
+        self.backend = backend
+        self.int8 = int8
+        self.out_q = self.ctx.Queue()
+        self.workers = {}   # nome -> (processo, fila de jobs)
+        self.ready = set()  # workers que já carregaram o modelo
+        self.idle = set()
+        self.running = {}   # nome do worker -> job em execução
+        self.pending = collections.deque()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._closing = False
+        for i in range(self.size):
+            self._spawn(f"analyzer-{i}")
+        self._dispatcher = threading.Thread(target=self._dispatch, name="analyzer-dispatch", daemon=True)
+        self._dispatcher.start()
+
+    @property
+    def available(self):
+        """False quando nenhum worker conseguiu subir (ex.: falha ao carregar o modelo)"""
+        return bool(self.workers)
+
+    def _spawn(self, name):
+        job_q = self.ctx.Queue()
+        w = self.ctx.Process(target=_worker_main, args=(name, job_q, self.out_q, self.backend, self.int8), name=name, daemon=True)
+        w.start()
+        self.workers[name] = (w, job_q)
+
+    def _assign(self):
+        # Chamado com self._lock
+        while self.idle and self.pending:
+            name = self.idle.pop()
+            job = self.pending.popleft()
+            self.running[name] = job
+            self.workers[name][1].put((job.job_id, job.argv))
+
+    def _finish(self, job, returncode):
+        job.returncode = returncode
+        job.q.put(None)
+        job._done.set()
+
+    def submit(self, argv):
+        """Enfileira uma análise com os mesmos argumentos de linha de comando do mvp_store_ai.py"""
+        job = AnalysisJob(next(self._ids), list(argv))
+        with self._lock:
+            self.pending.append(job)
+            self._assign()
+        return job
+
+    def _check_workers(self):
+        """Se um worker morrer no meio de uma análise, encerra o job com erro e sobe outro no lugar"""
+        failed = []
+        with self._lock:
+            for name, (w, _) in list(self.workers.items()):
+                if w.is_alive() or self._closing:
+                    continue
+                print(f"[ERRO] Worker {name} terminou inesperadamente (código {w.exitcode})")
+                self.idle.discard(name)
+                job = self.running.pop(name, None)
+                if job is not None:
+                    failed.append((job, w.exitcode if w.exitcode else -1))
+                del self.workers[name]
+                # Se falhou antes de carregar o modelo, subir de novo só repetiria o erro
+                if name in self.ready:
+                    self.ready.discard(name)
+                    self._spawn(name)
+            if not self.workers and not self._closing:
+                failed += [(job, 1) for job in self.pending]
+                self.pending.clear()
+        for job, returncode in failed:
+            self._finish(job, returncode)
+
+    def _dispatch(self):
+        last_check = time.time()
+        while True:
+            if time.time() - last_check >= 1.0:
+                self._check_workers()
+                last_check = time.time()
+            try:
+                msg = self.out_q.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if msg is None:
+                break
+            name, job_id, kind, payload = msg
+            with self._lock:
+                job = self.running.get(name)
+                if job is not None and job.job_id != job_id:
+                    job = None
+                if kind == "ready":
+                    self.ready.add(name)
+                    self.idle.add(name)
+                    self._assign()
+                elif kind == "done" and job is not None:
+                    del self.running[name]
+                    self.idle.add(name)
+                    self._assign()
+            if job is None:
+                continue
+            if kind == "record":
+                job.q.put(payload)
+            elif kind == "line":
+                record = parse_line(payload)
+                if record is not None:
+                    job.q.put(record)
+            elif kind == "done":
+                self._finish(job, payload)
+
+    def shutdown(self, timeout=5.0):
+        self._closing = True
+        for w, job_q in self.workers.values():
+            job_q.put(None)
+        for w, _ in self.workers.values():
+            w.join(timeout)
+            if w.is_alive():
+                w.terminate()
+        self.out_q.put(None)
+        self._dispatcher.join(timeout)
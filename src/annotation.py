@@ -0,0 +1,94 @@
+# src/annotation.py
+import queue, threading
+import cv2
+import numpy as np
+from profiler import Timings, now
+
+def roi_label_pos(poly):
+    return int(np.mean(poly[:,0])), int(np.mean(poly[:,1]))
+
+class RoiLayer:
+    """Camada estática com polígonos e nomes das ROIs, renderizada uma única vez por tamanho de frame"""
+    def __init__(self, rois, frame_shape):
+        h, w = frame_shape[:2]
+        self.layer = np.zeros((h, w, 3), dtype=np.uint8)
+        mask = np.zeros((h, w), dtype=np.uint8)
+        for r in rois:
+            cx, cy = roi_label_pos(r["poly"])
+            # Desenha na camada (cores reais) e na máscara (onde copiar), inclusive o contorno preto do texto
+            for img, outline, color in ((self.layer, (0,0,0), (0,255,255)), (mask, 255, 255)):
+                cv2.polylines(img, [r["poly"]], True, color, 2)
+                cv2.putText(img, r["name"], (cx, cy), cv2.FONT_HERSHEY_SIMPLEX, 0.6, outline, 3, cv2.LINE_AA)
+                cv2.putText(img, r["name"], (cx, cy), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        self.mask = mask > 0
+
+    def apply(self, frame):
+        np.copyto(frame, self.layer, where=self.mask[..., None])
+        return frame
+
+def draw_overlay(frame, ops):
+    """Aplica as operações de desenho dinâmicas coletadas durante o processamento do frame"""
+    for op in ops:
+        if op[0] == "text":
+            _, text, org, scale, color, thickness = op
+            cv2.putText(frame, text, org, cv2.FONT_HERSHEY_SIMPLEX, scale, color, thickness)
+        elif op[0] == "circle":
+            _, center, radius, color = op
+            cv2.circle(frame, center, radius, color, -1)
+    return frame
+
+class AsyncAnnotatedWriter:
+    """Renderiza o overlay e codifica o vídeo anotado em uma thread separada"""
+    def __init__(self, path, fps, rois, queue_size=8):
+        self.path = path
+        self.fps = fps if fps and fps > 0 else 30.0
+        self.rois = rois
+        self.layer = None
+        self.writer = None
+        self.error = None
+        self.frames_written = 0
+        self.render_s = Timings()  # overlay + codificação, por frame
+        # Fila limitada: se a codificação atrasar, o loop principal espera (não descarta frames)
+        self.q = queue.Queue(maxsize=queue_size)
+        self.thread = threading.Thread(target=self._run, name="annotated-writer", daemon=True)
+        self.thread.start()
+
+    def write(self, frame, ops):
+        """Enfileira um frame; ops=None indica que o frame já foi renderizado"""
+        if self.error is None:
+            self.q.put((frame, ops))
+
+    def _run(self):
+        while True:
+            item = self.q.get()
+            if item is None:
+                break
+            if self.error is not None:
+                continue
+            frame, ops = item
+            t0 = now()
+            try:
+                if self.writer is None:
+                    h, w = frame.shape[:2]
+                    self.layer = RoiLayer(self.rois, frame.shape)
+                    self.writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*"mp4v"), self.fps, (w, h))
+                    if not self.writer.isOpened():
+                        raise IOError(f"Não foi possível abrir {self.path} para escrita")
+                if ops is not None:
+                    self.layer.apply(frame)
+                    draw_overlay(frame, ops)
+                self.writer.write(frame)
+                self.frames_written += 1
+                self.render_s.since(t0)
+            except Exception as e:
+                self.error = e
+
+    def close(self):
+        self.q.put(None)
+        self.thread.join()
+        if self.writer is not None:
+            self.writer.release()
+        if self.error is not None:
+            print(f"[ERRO] Falha ao gravar vídeo anotado: {self.error}")
+        else:
+            print(f"[INFO] Vídeo anotado salvo em {self.path} ({self.frames_written} frames)")
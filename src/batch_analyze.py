@@ -0,0 +1,117 @@
+# src/batch_analyze.py
+import argparse, json, os, time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+VIDEO_EXTS = (".mp4", ".avi", ".mov")
+
+def load_jobs(source):
+    """Monta a lista de vídeos a partir de um diretório ou de um manifesto.
+
+    Manifesto .json: lista de caminhos ou de objetos {"video", "camera_id", "video_start"};
+    manifesto .txt: um caminho por linha. Caminhos relativos são resolvidos a partir do manifesto.
+    """
+    if os.path.isdir(source):
+        entries = [os.path.join(source, f) for f in sorted(os.listdir(source)) if f.lower().endswith(VIDEO_EXTS)]
+        base = source
+    else:
+        base = os.path.dirname(os.path.abspath(source))
+        with open(source, "r", encoding="utf-8") as f:
+            if source.lower().endswith(".json"):
+                entries = json.load(f)
+            else:
+                entries = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+    jobs = []
+    for entry in entries:
+        job = dict(entry) if isinstance(entry, dict) else {"video": entry}
+        # URLs de câmera (rtsp://, http://) não são caminhos
+        if not os.path.isabs(job["video"]) and "://" not in job["video"]:
+            job["video"] = os.path.join(base, job["video"])
+        # Sem camera_id no manifesto: usa o nome do arquivo, evitando colisão de id_pessoa entre vídeos
+        job.setdefault("camera_id", os.path.splitext(os.path.basename(job["video"]))[0][:32])
+        jobs.append(job)
+    return jobs
+
+# Modelo carregado uma vez por processo e reaproveitado em todos os vídeos do worker
+_model = None
+
+def _init_worker(threads, backend, int8):
+    global _model
+    import torch
+    torch.set_num_threads(threads)
+    from mvp_store_ai import load_pose_model
+    _model = load_pose_model(backend, int8)
+
+def _run_job(job, analyzer_argv):
+    from mvp_store_ai import build_arg_parser, analyze_video
+    argv = ["--video", job["video"], "--camera-id", job["camera_id"], "--headless", *analyzer_argv]
+    if job.get("video_start"):
+        argv += ["--video-start", str(job["video_start"])]
+    return analyze_video(build_arg_parser().parse_args(argv), model=_model, persist=False)
+
+def main():
+    ap = argparse.ArgumentParser(description="Análise em lote de vários vídeos com um pool de processos. "
+                                             "Opções não reconhecidas são repassadas ao mvp_store_ai.py.")
+    ap.add_argument("--videos", required=True, help="Diretório com vídeos ou manifesto (.json/.txt)")
+    ap.add_argument("--rois", default="rois.json")
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="Processos de análise")
+    ap.add_argument("--threads-per-worker", type=int, default=None, help="Threads do torch por worker (padrão: núcleos / workers)")
+    ap.add_argument("--no-db", action="store_true", help="Apenas analisa e mostra o resumo, sem gravar no banco")
+    ap.add_argument("--backend", default="auto", help="Runtime do modelo: auto, openvino, onnx ou torch")
+    ap.add_argument("--int8", action="store_true", help="Quantiza o modelo exportado para INT8 (onnx/openvino)")
+    args, analyzer_argv = ap.parse_known_args()
+
+    jobs = load_jobs(args.videos)
+    if not jobs:
+        print(f"[ERRO] Nenhum vídeo encontrado em {args.videos}")
+        return
+    workers = max(1, min(args.workers, len(jobs)))
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+    print(f"[INFO] {len(jobs)} vídeos, {workers} workers x {threads} threads")
+    # Exporta o modelo (se preciso) antes de subir os workers, que só carregam o artefato
+    from pose_model import prepare_backend
+    backend, _ = prepare_backend(args.backend, args.int8)
+
+    events_data, objects_data, paths_data, sessions_data = [], [], [], []
+    total_customers = total_events = failed = 0
+    t_start = time.time()
+    # spawn: o pai já importou torch (e talvez exportou o modelo); fork depois disso pode travar no OpenMP
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"), initializer=_init_worker,
+                             initargs=(threads, backend, args.int8 and backend != "torch")) as pool:
+        futures = {pool.submit(_run_job, job, ["--rois", args.rois, *analyzer_argv]): job for job in jobs}
+        for fut in as_completed(futures):
+            job = futures[fut]
+            try:
+                summary = fut.result()
+            except Exception as e:
+                failed += 1
+                print(f"[ERRO] {job['video']}: {e}")
+                continue
+            if summary is None:
+                continue
+            ev, obj, paths, sess = summary["rows"]
+            events_data += ev; objects_data += obj; paths_data += paths; sessions_data += sess
+            total_customers += summary["total_customers"]
+            total_events += summary["total_events"]
+            print(f"[OK] {job['video']}: {summary['total_customers']} clientes, {summary['total_events']} eventos, "
+                  f"{summary['duration_s']:.0f}s de vídeo em {summary['elapsed_s']:.1f}s")
+
+    print(f"[STATS] VIDEOS: {len(jobs) - failed}/{len(jobs)} em {time.time() - t_start:.1f}s")
+    print(f"[STATS] TOTAL_CUSTOMERS: {total_customers}")
+    print(f"[STATS] TOTAL_INTERACTIONS: {total_events}")
+    if args.no_db:
+        return
+
+    # Uma única gravação em lote para todos os vídeos
+    from db_oracle import init_db, save_analysis_data_batch
+    print("[INFO] Salvando dados no Oracle Database...")
+    try:
+        init_db()
+        save_analysis_data_batch(events_data, objects_data, paths_data, sessions_data)
+        print(f"[INFO] Total: {len(events_data)} eventos, {len(paths_data)} posições, {len(sessions_data)} sessões")
+    except Exception as e:
+        print(f"[ERRO] Falha ao salvar no banco: {e}")
+
+if __name__ == "__main__":
+    main()
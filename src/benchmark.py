@@ -0,0 +1,355 @@
+# src/benchmark.py
+"""Benchmark do pipeline de análise (mvp_store_ai.analyze_video).
+
+Roda os vídeos de data/videos e clipes sintéticos (pessoas, ROIs e resolução configuráveis)
+com o modelo real e/ou com um detector stub, que devolve pessoas sintéticas sem rodar rede
+neural, para medir decodificação, tracking e motor de regras isoladamente. Cada caso roda
+num processo novo (pico de RSS por caso) e o resultado é comparado com um baseline salvo.
+
+O baseline depende do hardware, então não vem no repositório: gere-o uma vez na máquina de
+referência, com os mesmos casos e opções que serão comparados, e versione o arquivo se quiser
+compartilhá-lo:
+    python benchmark.py --synthetic 4:6:1280x720 --detector stub --save-baseline
+As execuções seguintes com os mesmos argumentos (sem --save-baseline) acusam regressões de
+fps e de pico de RSS acima de --tolerance.
+"""
+import argparse, glob, json, math, os, platform, subprocess, sys, time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+
+# Esqueleto COCO usado para desenhar as pessoas dos clipes sintéticos
+SKELETON = ((5, 7), (7, 9), (6, 8), (8, 10), (5, 6), (5, 11), (6, 12), (11, 12), (11, 13), (13, 15), (12, 14), (14, 16))
+PERSON_CYCLE = 600     # frames: cada pessoa sintética aparece, anda pelas ROIs e sai
+PERSON_VISIBLE = 450
+# Marcador do índice do frame nos clipes sintéticos: blocos pretos/brancos no canto superior
+# esquerdo (2 de guarda + 18 bits), para o stub saber qual frame recebeu
+MARKER_BLOCK = 8
+MARKER_BITS = 18
+_MARKER_GUARD = (1, 0)
+# Opções do analisador com que o stub não recebe todos os frames, em ordem
+_SKIPPING_OPTS = ("--stride", "--target-fps", "--detect-every", "--motion-gate")
+
+def draw_frame_marker(frame, t):
+    bits = list(_MARKER_GUARD) + [(t >> k) & 1 for k in range(MARKER_BITS)]
+    b = MARKER_BLOCK
+    for i, bit in enumerate(bits):
+        frame[:b, i * b:(i + 1) * b] = 255 if bit else 0
+
+def read_frame_marker(frame):
+    """Índice do frame gravado por draw_frame_marker (None se o frame não tiver marcador)"""
+    b = MARKER_BLOCK
+    n = len(_MARKER_GUARD) + MARKER_BITS
+    if frame.shape[0] < b or frame.shape[1] < n * b:
+        return None
+    # Centro de cada bloco (a compressão borra as bordas)
+    cells = frame[b // 4:b - b // 4, :n * b].reshape(b - 2 * (b // 4), n, b, -1)[:, :, b // 4:b - b // 4]
+    bits = (cells.mean(axis=(0, 2, 3)) > 127).astype(int).tolist()
+    if tuple(bits[:len(_MARKER_GUARD)]) != _MARKER_GUARD:
+        return None
+    return sum(bit << k for k, bit in enumerate(bits[len(_MARKER_GUARD):]))
+
+def synthetic_people(t, n, w, h):
+    """Pessoas sintéticas no frame t: caixas (N, 6) [x1, y1, x2, y2, conf, classe] e keypoints (N, 17, 3).
+
+    Trajetórias determinísticas (Lissajous) que passam pelas ROIs, com a distância entre os
+    punhos oscilando para disparar as regras de segurar objeto e carrinho.
+    """
+    boxes, kps = [], []
+    bh, bw = 0.35 * h, 0.12 * w
+    for i in range(n):
+        if (t + i * 97) % PERSON_CYCLE >= PERSON_VISIBLE:
+            continue
+        phase = 2 * math.pi * i / max(1, n)
+        cx = w * (0.5 + 0.38 * math.sin(2 * math.pi * t / (240 + 37 * i) + phase))
+        cy = h * (0.5 + 0.28 * math.sin(2 * math.pi * t / (310 + 23 * i) + 2 * phase))
+        x1, y1 = cx - bw / 2, cy - bh / 2
+        wrist = 10 + 110 * (0.5 + 0.5 * math.sin(2 * math.pi * t / 90 + phase))  # distância entre punhos
+        look = 0.25 * bw * math.sin(2 * math.pi * t / 150 + phase)               # direção da cabeça
+        pts = np.array([
+            (cx + look, y1 + 0.08 * bh),                                                   # nariz
+            (cx - 0.06 * bw, y1 + 0.06 * bh), (cx + 0.06 * bw, y1 + 0.06 * bh),              # olhos
+            (cx - 0.1 * bw, y1 + 0.07 * bh), (cx + 0.1 * bw, y1 + 0.07 * bh),                # orelhas
+            (cx - 0.3 * bw, y1 + 0.2 * bh), (cx + 0.3 * bw, y1 + 0.2 * bh),                  # ombros
+            (cx - 0.35 * bw, y1 + 0.35 * bh), (cx + 0.35 * bw, y1 + 0.35 * bh),              # cotovelos
+            (cx - wrist / 2, y1 + 0.45 * bh), (cx + wrist / 2, y1 + 0.45 * bh),              # punhos
+            (cx - 0.2 * bw, y1 + 0.55 * bh), (cx + 0.2 * bw, y1 + 0.55 * bh),                # quadris
+            (cx - 0.2 * bw, y1 + 0.77 * bh), (cx + 0.2 * bw, y1 + 0.77 * bh),                # joelhos
+            (cx - 0.2 * bw, y1 + 0.98 * bh), (cx + 0.2 * bw, y1 + 0.98 * bh),                # tornozelos
+        ], dtype=np.float32)
+        pts[:, 0] = np.clip(pts[:, 0], 1, w - 1)
+        pts[:, 1] = np.clip(pts[:, 1], 1, h - 1)
+        boxes.append((max(0.0, x1), max(0.0, y1), min(w - 1.0, x1 + bw), min(h - 1.0, y1 + bh), 0.9, 0))
+        kps.append(np.concatenate([pts, np.full((17, 1), 0.9, np.float32)], axis=1))
+    return (np.array(boxes, dtype=np.float32).reshape(-1, 6),
+            np.array(kps, dtype=np.float32).reshape(-1, 17, 3))
+
+class StubPoseModel:
+    """Detector stub com a interface do YOLO usada pelo PoseTracker (predict -> Results).
+
+    O tempo das pessoas sintéticas vem do marcador do frame (clipes sintéticos), então as
+    caixas coincidem com o desenho mesmo com --stride, --detect-every ou --motion-gate; sem
+    marcador (vídeos reais) cada frame recebido avança o tempo. O custo fica só no pipeline
+    (ByteTrack, propagação, regras), sem inferência.
+    """
+    backend_name = "stub"
+
+    def __init__(self, people=4, marked=False):
+        self.people = people
+        self.marked = marked
+        self.t = 0
+
+    def predict(self, frames, verbose=False, conf=0.3, iou=0.5, **kwargs):
+        import torch
+        from ultralytics.engine.results import Results
+        results = []
+        for frame in frames:
+            h, w = frame.shape[:2]
+            t = read_frame_marker(frame)
+            if t is None:
+                if self.marked:
+                    raise ValueError("Frame sem marcador de índice (o stub não funciona com --roi-crop)")
+                t = self.t
+            self.t = t + 1
+            boxes, kps = synthetic_people(t, self.people, w, h)
+            results.append(Results(frame, path="", names={0: "person"},
+                                   boxes=torch.from_numpy(boxes), keypoints=torch.from_numpy(kps)))
+        return results
+
+def synthetic_rois(n, w, h):
+    """n ROIs retangulares em grade; com 3 ou mais, a penúltima é o carrinho e a última o caixa"""
+    cols = math.ceil(math.sqrt(n))
+    rows = math.ceil(n / cols)
+    cw, ch = w / cols, h / rows
+    rois = []
+    for k in range(n):
+        x0, y0 = (k % cols) * cw, (k // cols) * ch
+        name = "cart" if n >= 3 and k == n - 2 else "checkout" if n >= 3 and k == n - 1 else f"shelf_{k + 1}"
+        pts = [(x0 + 0.1 * cw, y0 + 0.1 * ch), (x0 + 0.9 * cw, y0 + 0.1 * ch), (x0 + 0.9 * cw, y0 + 0.9 * ch), (x0 + 0.1 * cw, y0 + 0.9 * ch)]
+        rois.append({"name": name, "points": [[int(x), int(y)] for x, y in pts]})
+    return rois
+
+def make_clip(path, people, w, h, seconds, fps):
+    """Grava o clipe sintético (fundo fixo com textura + esqueletos das pessoas sintéticas)"""
+    rng = np.random.default_rng(0)
+    background = cv2.GaussianBlur(rng.integers(60, 140, (h, w, 3), dtype=np.uint8), (0, 0), 3)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
+    if not writer.isOpened():
+        raise IOError(f"Não foi possível criar {path}")
+    for t in range(int(seconds * fps)):
+        frame = background.copy()
+        boxes, kps = synthetic_people(t, people, w, h)
+        for box, kp in zip(boxes, kps):
+            color = (40 + 50 * (int(box[0]) % 4), 200, 255 - 40 * (int(box[1]) % 4))
+            for a, b in SKELETON:
+                cv2.line(frame, tuple(map(int, kp[a, :2])), tuple(map(int, kp[b, :2])), color, max(2, w // 320))
+            cv2.circle(frame, tuple(map(int, kp[0, :2])), max(4, int(0.04 * (box[3] - box[1]))), color, -1)
+        draw_frame_marker(frame, t)
+        writer.write(frame)
+    writer.release()
+
+def _has_marker(video):
+    """Clipe gerado com o marcador de frame (clipes antigos são regenerados)"""
+    cap = cv2.VideoCapture(video)
+    ok, frame = cap.read()
+    cap.release()
+    return ok and read_frame_marker(frame) == 0
+
+def parse_synthetic(spec):
+    """'pessoas:rois:LxA', ex.: 4:6:1280x720"""
+    people, rois, res = spec.split(":")
+    w, h = res.lower().split("x")
+    if int(w) < (len(_MARKER_GUARD) + MARKER_BITS) * MARKER_BLOCK or int(h) < MARKER_BLOCK:
+        raise ValueError(f"Resolução muito pequena para o marcador de frame: {res}")
+    return int(people), int(rois), int(w), int(h)
+
+def build_cases(args, rois_path, analyzer_argv=()):
+    """Casos do benchmark; grava os clipes sintéticos e um rois.json com as ROIs de todos os casos"""
+    with open(args.rois, "r", encoding="utf-8") as f:
+        all_rois = json.load(f)
+    sources = []
+    if args.videos:
+        for video in sorted(glob.glob(os.path.join(args.videos, "*.mp4"))):
+            key = os.path.basename(video)
+            if all_rois.get(key):
+                sources.append({"name": os.path.splitext(key)[0], "video": video, "roi_key": key,
+                                "people": args.stub_people, "marked": False})
+            else:
+                print(f"[INFO] {key} sem ROIs em {args.rois}; fora do benchmark")
+    for spec in args.synthetic:
+        people, n_rois, w, h = parse_synthetic(spec)
+        name = f"synthetic_p{people}_r{n_rois}_{w}x{h}_{args.synthetic_seconds:g}s_{args.synthetic_fps:g}fps"
+        video = os.path.join(args.work_dir, name + ".mp4")
+        if not os.path.exists(video) or not _has_marker(video):
+            print(f"[INFO] Gerando {video}...")
+            make_clip(video, people, w, h, args.synthetic_seconds, args.synthetic_fps)
+        all_rois[name + ".mp4"] = synthetic_rois(n_rois, w, h)
+        sources.append({"name": name, "video": video, "roi_key": name + ".mp4", "people": people, "marked": True})
+    with open(rois_path, "w", encoding="utf-8") as f:
+        json.dump(all_rois, f, ensure_ascii=False)
+
+    detectors = ("real", "stub") if args.detector == "both" else (args.detector,)
+    cases = []
+    for src in sources:
+        for det in detectors:
+            reason = stub_unsupported(src, analyzer_argv) if det == "stub" else None
+            if reason:
+                print(f"[INFO] {src['name']}/stub fora do benchmark: {reason}")
+                continue
+            cases.append({**src, "name": f"{src['name']}/{det}", "detector": det, "rois": rois_path})
+    return cases
+
+def stub_unsupported(src, analyzer_argv):
+    """Motivo para não rodar o stub com estas opções (None se os números forem comparáveis)"""
+    ap = argparse.ArgumentParser(add_help=False)
+    ap.add_argument("--stride", type=int, default=1)
+    ap.add_argument("--target-fps", type=float, default=None)
+    ap.add_argument("--detect-every", type=int, default=1)
+    ap.add_argument("--motion-gate", action="store_true")
+    ap.add_argument("--roi-crop", action="store_true")
+    opts, _ = ap.parse_known_args(analyzer_argv)
+    if opts.roi_crop:
+        return "--roi-crop (as pessoas do stub sairiam nas coordenadas do recorte)"
+    if not src["marked"] and (opts.stride > 1 or opts.target_fps or opts.detect_every > 1 or opts.motion_gate):
+        return f"vídeo sem marcador de frame com {'/'.join(_SKIPPING_OPTS)} (o stub perderia a sincronia com o vídeo)"
+    return None
+
+def _run_case(case, analyzer_argv):
+    """Executa um caso num processo novo e devolve as métricas (saída do analisador suprimida)"""
+    import contextlib, io
+    from mvp_store_ai import build_arg_parser, analyze_video
+    argv = ["--video", case["video"], "--rois", case["rois"], "--roi-key", case["roi_key"],
+            "--camera-id", "bench", "--headless", *analyzer_argv]
+    model = StubPoseModel(case["people"], case["marked"]) if case["detector"] == "stub" else None
+    out = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(out):
+            summary = analyze_video(build_arg_parser().parse_args(argv), model=model, persist=False)
+    except Exception as e:
+        raise RuntimeError(f"{e}\n{out.getvalue()[-2000:]}") from e
+    report = summary["performance"]
+    return {
+        "frames": report["frames"], "elapsed_s": report["elapsed_s"], "fps": report["fps"],
+        "backend": report["backend"], "keyframes": report["keyframes"],
+        "customers": summary["total_customers"], "events": summary["total_events"],
+        "persons_per_frame": report["persons_per_frame"]["mean"],
+        "peak_rss_mb": report["memory"]["peak_rss_mb"],
+        "stages": {name: {k: st[k] for k in ("mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms")}
+                   for name, st in report["stages"].items()},
+    }
+
+def run_case(case, analyzer_argv, repeat):
+    """Mediana de fps de `repeat` execuções (as demais métricas vêm da execução mediana)"""
+    runs = []
+    ctx = mp.get_context("spawn")
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            runs.append(pool.submit(_run_case, case, analyzer_argv).result())
+    runs.sort(key=lambda r: r["fps"])
+    result = runs[len(runs) // 2]
+    result["fps_runs"] = [r["fps"] for r in runs]
+    return result
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit,
+        "python": platform.python_version(), "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(), "cpus": os.cpu_count(),
+        "opencv": cv2.__version__, "numpy": np.__version__,
+    }
+
+def compare(results, baseline, tolerance):
+    """Compara com o baseline por nome de caso; devolve a lista de regressões"""
+    regressions = []
+    base_cases = baseline.get("cases", {})
+    for name, cur in results["cases"].items():
+        base = base_cases.get(name)
+        if base is None:
+            print(f"[STATS] BENCH {name}: {cur['fps']:.1f} fps (sem baseline)")
+            continue
+        fps_delta = cur["fps"] / base["fps"] - 1.0 if base["fps"] else 0.0
+        line = f"[STATS] BENCH {name}: {cur['fps']:.1f} fps ({fps_delta:+.1%} vs {base['fps']:.1f})"
+        if cur.get("peak_rss_mb") and base.get("peak_rss_mb"):
+            rss_delta = cur["peak_rss_mb"] / base["peak_rss_mb"] - 1.0
+            line += f", RSS {cur['peak_rss_mb']:.0f} MB ({rss_delta:+.1%})"
+            if rss_delta > tolerance:
+                regressions.append(f"{name}: pico de RSS {rss_delta:+.1%}")
+        for stage, st in cur["stages"].items():
+            b = base.get("stages", {}).get(stage)
+            if b and b["p50_ms"] > 0 and st["p50_ms"] / b["p50_ms"] - 1.0 > tolerance:
+                line += f", {stage} p50 {st['p50_ms']:.1f}ms ({st['p50_ms'] / b['p50_ms'] - 1.0:+.0%})"
+        print(line)
+        if fps_delta < -tolerance:
+            regressions.append(f"{name}: fps {fps_delta:+.1%}")
+    if baseline.get("environment", {}).get("processor") != results["environment"]["processor"]:
+        print("[INFO] Baseline gerado em outra máquina; compare os números com cautela")
+    return regressions
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark do pipeline de análise. Opções não reconhecidas são "
+                                             "repassadas ao mvp_store_ai.py (ex.: --batch 4 --detect-every 2).")
+    ap.add_argument("--videos", default="../data/videos", help="Diretório com os vídeos .mp4 ('' para não usar)")
+    ap.add_argument("--rois", default="../rois.json")
+    ap.add_argument("--synthetic", action="append", default=[], metavar="P:R:LxA",
+                    help="Clipe sintético com P pessoas, R ROIs e resolução LxA (repetível), ex.: 4:6:1280x720")
+    ap.add_argument("--synthetic-seconds", type=float, default=20.0)
+    ap.add_argument("--synthetic-fps", type=float, default=15.0)
+    ap.add_argument("--stub-people", type=int, default=4, help="Pessoas do detector stub nos vídeos reais")
+    ap.add_argument("--detector", choices=("real", "stub", "both"), default="both")
+    ap.add_argument("--repeat", type=int, default=1, help="Execuções por caso (vale a mediana de fps)")
+    ap.add_argument("--work-dir", default="../benchmarks", help="Clipes sintéticos, resultados e baseline")
+    ap.add_argument("--out", default=None, help="Arquivo de resultados (padrão: <work-dir>/results.json)")
+    ap.add_argument("--baseline", default=None, help="Baseline para comparação (padrão: <work-dir>/baseline.json)")
+    ap.add_argument("--save-baseline", action="store_true", help="Grava os resultados desta execução como baseline")
+    ap.add_argument("--tolerance", type=float, default=0.10, help="Queda de fps / aumento de RSS tolerado antes de acusar regressão")
+    args, analyzer_argv = ap.parse_known_args()
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    out_path = args.out or os.path.join(args.work_dir, "results.json")
+    baseline_path = args.baseline or os.path.join(args.work_dir, "baseline.json")
+    cases = build_cases(args, os.path.join(args.work_dir, "rois_benchmark.json"), analyzer_argv)
+    if not cases:
+        print("[ERRO] Nenhum caso de benchmark (sem vídeos com ROIs e sem --synthetic)")
+        sys.exit(2)
+
+    results = {"environment": environment(), "analyzer_args": analyzer_argv, "cases": {}}
+    failed = 0
+    for case in cases:
+        print(f"[INFO] {case['name']}...")
+        try:
+            res = run_case(case, analyzer_argv, max(1, args.repeat))
+        except Exception as e:
+            failed += 1
+            print(f"[ERRO] {case['name']}: {e}")
+            continue
+        results["cases"][case["name"]] = res
+        frame = res["stages"].get("frame", {})
+        print(f"[OK] {case['name']}: {res['fps']:.1f} fps, {res['frames']} frames, frame p50 {frame.get('p50_ms', 0):.1f}ms "
+              f"p99 {frame.get('p99_ms', 0):.1f}ms, RSS {res['peak_rss_mb']} MB")
+
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"[INFO] Resultados em {out_path}")
+
+    regressions = []
+    if args.save_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"[INFO] Baseline salvo em {baseline_path}")
+    elif os.path.exists(baseline_path):
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+    else:
+        print(f"[INFO] Sem baseline em {baseline_path}: rode uma vez com --save-baseline (mesmos casos e opções) "
+              f"para as próximas execuções compararem")
+    for r in regressions:
+        print(f"[ERRO] Regressão: {r}")
+    sys.exit(1 if regressions or failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 # src/db_oracle.py
-import os, json, datetime as dt
+import os, json, queue, threading, time, datetime as dt
 import oracledb
+from profiler import Timings, now
 from dotenv import load_dotenv; load_dotenv()
 
 # ENV
@@ -315,6 +316,47 @@ def get_total_video_duration():
         result = cur.fetchone()
         return result[0] if result else 0
 
+def _insert_rows(cur, events_data, objects_data, paths_data, sessions_data):
+    """INSERTs das linhas de análise (sem commit); usado pela gravação em lote e pelo StreamingWriter.
+    Linhas podem ser dicts ou tuplas na ordem das colunas do INSERT (binds de recorder.person_rows)."""
+    if events_data:
+        cur.executemany(
+            f"""INSERT INTO {SCHEMA}.eventos_loja 
+                (data_hora, id_pessoa, id_camera, tipo_evento, id_roi, confianca, dados_extras)
+                VALUES (:ts, :pid, :cam, :evt, :roi, :conf, :extra)""",
+            events_data
+        )
+    if objects_data:
+        cur.executemany(
+            f"""INSERT INTO {SCHEMA}.objetos_cliente 
+                (data_hora, id_pessoa, id_camera, tipo_objeto, id_roi, acao, confianca)
+                VALUES (:ts, :pid, :cam, :obj_type, :roi, :action, :conf)""",
+            objects_data
+        )
+    if paths_data:
+        cur.executemany(
+            f"""INSERT INTO {SCHEMA}.caminhos_cliente 
+                (data_hora, id_pessoa, id_camera, x, y, id_roi)
+                VALUES (:ts, :pid, :cam, :x, :y, :roi)""",
+            paths_data
+        )
+    # Sessões: INSERT simples para evitar complexidade do MERGE
+    for session in sessions_data:
+        try:
+            cur.execute(
+                f"""INSERT INTO {SCHEMA}.sessoes_cliente (id_pessoa, primeira_data, ultima_data, id_camera)
+                    VALUES (:pid, :ts, :ts, :cam)""",
+                session
+            )
+        except Exception:
+            # Se já existe, atualiza a última data
+            cur.execute(
+                f"""UPDATE {SCHEMA}.sessoes_cliente 
+                    SET ultima_data = :ts 
+                    WHERE id_pessoa = :pid AND id_camera = :cam""",
+                session
+            )
+
 def save_analysis_data_batch(events_data, objects_data, paths_data, sessions_data):
     """
     Salva dados de análise em lote para melhor performance e evitar timeouts
@@ -322,54 +364,10 @@ def save_analysis_data_batch(events_data, objects_data, paths_data, sessions_dat
     try:
         with _connect() as conn:
             with conn.cursor() as cur:
-                # Salvar eventos em lote usando executemany (mais eficiente)
-                if events_data:
-                    print(f"[INFO] Salvando {len(events_data)} eventos em lote...")
-                    cur.executemany(
-                        f"""INSERT INTO {SCHEMA}.eventos_loja 
-                            (data_hora, id_pessoa, id_camera, tipo_evento, id_roi, confianca, dados_extras)
-                            VALUES (:ts, :pid, :cam, :evt, :roi, :conf, :extra)""",
-                        events_data
-                    )
-                
-                # Salvar objetos em lote usando executemany
-                if objects_data:
-                    print(f"[INFO] Salvando {len(objects_data)} objetos em lote...")
-                    cur.executemany(
-                        f"""INSERT INTO {SCHEMA}.objetos_cliente 
-                            (data_hora, id_pessoa, id_camera, tipo_objeto, id_roi, acao, confianca)
-                            VALUES (:ts, :pid, :cam, :obj_type, :roi, :action, :conf)""",
-                        objects_data
-                    )
-                
-                # Salvar paths em lote usando executemany
-                if paths_data:
-                    print(f"[INFO] Salvando {len(paths_data)} posições em lote...")
-                    cur.executemany(
-                        f"""INSERT INTO {SCHEMA}.caminhos_cliente 
-                            (data_hora, id_pessoa, id_camera, x, y, id_roi)
-                            VALUES (:ts, :pid, :cam, :x, :y, :roi)""",
-                        paths_data
-                    )
-                
-                # Salvar sessões em lote (usando INSERT simples para evitar complexidade do MERGE)
-                if sessions_data:
-                    print(f"[INFO] Salvando {len(sessions_data)} sessões em lote...")
-                    for session in sessions_data:
-                        try:
-                            cur.execute(
-                                f"""INSERT INTO {SCHEMA}.sessoes_cliente (id_pessoa, primeira_data, ultima_data, id_camera)
-                                    VALUES (:pid, :ts, :ts, :cam)""",
-                                session
-                            )
-                        except Exception:
-                            # Se já existe, atualiza a última data
-                            cur.execute(
-                                f"""UPDATE {SCHEMA}.sessoes_cliente 
-                                    SET ultima_data = :ts 
-                                    WHERE id_pessoa = :pid AND id_camera = :cam""",
-                                session
-                            )
+                # Salvar tudo em lote usando executemany (mais eficiente)
+                print(f"[INFO] Salvando em lote: {len(events_data)} eventos, {len(objects_data)} objetos, "
+                      f"{len(paths_data)} posições, {len(sessions_data)} sessões...")
+                _insert_rows(cur, events_data, objects_data, paths_data, sessions_data)
                 
                 # Commit uma única vez para todas as operações
                 conn.commit()
@@ -379,3 +377,95 @@ def save_analysis_data_batch(events_data, objects_data, paths_data, sessions_dat
         print(f"[ERRO] Falha ao salvar dados em lote: {e}")
         # Não fazer raise para não interromper o fluxo
         print("[INFO] Continuando sem salvar no banco...")
+
+_STOP = object()
+
+class StreamingWriter:
+    """Grava as linhas da análise no Oracle em uma thread própria, enquanto a inferência continua.
+
+    add() coloca as linhas numa fila limitada (bloqueia se o banco ficar para trás). A thread
+    agrupa as linhas e grava com executemany quando acumula batch_rows linhas ou quando passam
+    flush_sec segundos; cada gravação termina em commit (checkpoint), então uma falha no meio
+    da análise não perde o que já foi gravado. close() grava o restante e encerra a conexão.
+    """
+    def __init__(self, batch_rows=500, flush_sec=2.0, queue_size=256, retries=2):
+        self.batch_rows = batch_rows
+        self.flush_sec = flush_sec
+        self.retries = retries
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.commits = 0
+        self.flush_s = Timings()  # executemany + commit (com retentativas), por gravação
+        self.counts = {"events": 0, "objects": 0, "paths": 0, "sessions": 0}
+        self._q = queue.Queue(maxsize=queue_size)
+        self._pending = ([], [], [], [])
+        self._conn = None
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, events_data, objects_data, paths_data, sessions_data):
+        if events_data or objects_data or paths_data or sessions_data:
+            self._q.put((events_data, objects_data, paths_data, sessions_data))
+
+    def _pending_rows(self):
+        return sum(len(rows) for rows in self._pending)
+
+    def _flush(self):
+        n = self._pending_rows()
+        if n == 0:
+            return
+        t0 = now()
+        for attempt in range(self.retries + 1):
+            try:
+                if self._conn is None:
+                    self._conn = _connect()
+                with self._conn.cursor() as cur:
+                    _insert_rows(cur, *self._pending)
+                self._conn.commit()
+                self.commits += 1
+                self.rows_written += n
+                for key, rows in zip(("events", "objects", "paths", "sessions"), self._pending):
+                    self.counts[key] += len(rows)
+                break
+            except Exception as e:
+                print(f"[ERRO] Falha ao gravar lote de {n} linhas (tentativa {attempt + 1}): {e}")
+                # Descarta a conexão; a próxima tentativa reconecta
+                try:
+                    self._conn.rollback()
+                    self._conn.close()
+                except Exception:
+                    pass
+                self._conn = None
+        else:
+            self.rows_failed += n
+        self._pending = ([], [], [], [])
+        self.flush_s.since(t0)
+
+    def _run(self):
+        last_flush = time.time()
+        while True:
+            timeout = max(0.0, self.flush_sec - (time.time() - last_flush))
+            try:
+                item = self._q.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                break
+            if item is not None:
+                for pending, rows in zip(self._pending, item):
+                    pending += rows
+            if self._pending_rows() >= self.batch_rows or time.time() - last_flush >= self.flush_sec:
+                self._flush()
+                last_flush = time.time()
+        self._flush()
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def close(self):
+        """Grava o que estiver pendente e encerra a thread"""
+        self._q.put(_STOP)
+        self._thread.join()
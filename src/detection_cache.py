@@ -0,0 +1,171 @@
+# src/detection_cache.py
+"""Cache de detecções: grava, por frame analisado, ids, caixas e keypoints que saíram do
+pipeline de detecção (modelo + ByteTrack + propagação) e os reproduz no motor de regras sem
+carregar o modelo. Mudar limiares (--dwell-sec, --gaze-sec, --depart-px...) ou as ROIs
+reaproveita o cache; mudar o vídeo, o modelo ou as opções de detecção gera outro.
+
+Formato: um diretório por chave com arrays .npy (abertos com mmap) e meta.json.
+"""
+import hashlib, json, os, shutil, tempfile, time
+import numpy as np
+from profiler import Timings
+
+CACHE_VERSION = 1
+CACHE_MODES = ("auto", "record", "replay")
+_ARRAYS = ("frame_idx", "pos_msec", "counts", "has_kp", "ids", "xyxys", "kp_xy")
+
+def file_hash(path, root=None):
+    """Hash do conteúdo do vídeo; com root, guarda o resultado por (caminho, tamanho, mtime) em
+    root/hashes.json para não reler o arquivo a cada execução"""
+    st = os.stat(path)
+    ident = [st.st_size, st.st_mtime]
+    index_path = os.path.join(root, "hashes.json") if root else None
+    index = {}
+    if index_path and os.path.exists(index_path):
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except ValueError:
+            index = {}
+    key = os.path.abspath(path)
+    if key in index and index[key][:2] == ident:
+        return index[key][2]
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    if index_path:
+        index[key] = ident + [digest]
+        with open(index_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+    return digest
+
+def cache_path(root, video, settings):
+    """Diretório do cache para o vídeo e as opções de detecção (dict JSON-serializável)"""
+    os.makedirs(root, exist_ok=True)
+    settings = {"version": CACHE_VERSION, "video_hash": file_hash(video, root), **settings}
+    key = hashlib.sha1(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(video))[0]
+    return os.path.join(root, f"{stem}_{key}"), settings
+
+def exists(path):
+    return os.path.exists(os.path.join(path, "meta.json"))
+
+class DetectionCacheWriter:
+    """Acumula as detecções de cada frame analisado e grava o cache no fim (de forma atômica)"""
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = dict(meta)
+        self.frame_idx, self.pos_msec, self.counts, self.has_kp = [], [], [], []
+        self.ids, self.xyxys, self.kp_xy = [], [], []
+        self.frame_shape = None
+
+    def add(self, frame_idx, pos_msec, frame_shape, det):
+        ids, xyxys, kp_xy = det
+        n = len(ids)
+        self.frame_idx.append(frame_idx)
+        self.pos_msec.append(pos_msec or 0.0)
+        self.counts.append(n)
+        self.has_kp.append(kp_xy is not None)
+        if self.frame_shape is None:
+            self.frame_shape = list(frame_shape)
+        if n:
+            # Cópias: a propagação atualiza os mesmos arrays no frame seguinte
+            self.ids.extend(ids)
+            self.xyxys.append(np.array(xyxys, dtype=np.float32).reshape(n, 4))
+            kp = np.zeros((n, 17, 2), dtype=np.float32)
+            if kp_xy is not None:
+                kp[:, :kp_xy.shape[1]] = kp_xy
+            self.kp_xy.append(kp)
+
+    def close(self):
+        arrays = {
+            "frame_idx": np.array(self.frame_idx, dtype=np.int64),
+            "pos_msec": np.array(self.pos_msec, dtype=np.float64),
+            "counts": np.array(self.counts, dtype=np.int32),
+            "has_kp": np.array(self.has_kp, dtype=bool),
+            "ids": np.array(self.ids, dtype=np.int64),
+            "xyxys": np.concatenate(self.xyxys) if self.xyxys else np.zeros((0, 4), np.float32),
+            "kp_xy": np.concatenate(self.kp_xy) if self.kp_xy else np.zeros((0, 17, 2), np.float32),
+        }
+        meta = {**self.meta, "frames": len(self.frame_idx), "detections": len(self.ids),
+                "frame_shape": self.frame_shape, "created": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        parent = os.path.dirname(os.path.abspath(self.path))
+        tmp = tempfile.mkdtemp(dir=parent, prefix=".tmp_")
+        try:
+            for name, arr in arrays.items():
+                np.save(os.path.join(tmp, name + ".npy"), arr)
+            with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2)
+            if os.path.isdir(self.path):
+                shutil.rmtree(self.path)
+            os.replace(tmp, self.path)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        size = sum(a.nbytes for a in arrays.values())
+        print(f"[OK] Cache de detecções gravado: {self.path} ({meta['frames']} frames, {size / 1048576.0:.1f} MB)")
+
+class DetectionCache:
+    """Cache aberto para leitura (arrays mapeados em memória)"""
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        for name in _ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, name + ".npy"), mmap_mode="r"))
+        self.offsets = np.concatenate([[0], np.cumsum(self.counts)])
+
+    def __len__(self):
+        return len(self.frame_idx)
+
+    def detections(self, i):
+        """(ids, xyxys, kp_xy) do i-ésimo frame gravado, no formato do DetectionPipeline"""
+        a, b = self.offsets[i], self.offsets[i + 1]
+        if a == b:
+            return [], np.zeros((0, 4), dtype=np.float32), None
+        kp_xy = np.array(self.kp_xy[a:b]) if self.has_kp[i] else None
+        return self.ids[a:b].tolist(), np.array(self.xyxys[a:b]), kp_xy
+
+class CachedFrames:
+    """Leitor sem decodificação para o replay: (índice, posição_ms, frame vazio do tamanho original).
+    O motor de regras só usa o tamanho do frame; o array não ocupa memória (stride zero)."""
+    def __init__(self, cache):
+        self.cache = cache
+        self.frame = np.broadcast_to(np.zeros(1, dtype=np.uint8), tuple(cache.meta["frame_shape"]))
+        self.frames_read = 0
+        self.frames_decoded = 0
+        self.decode_s = Timings()
+
+    def __iter__(self):
+        for idx, pos in zip(self.cache.frame_idx.tolist(), self.cache.pos_msec.tolist()):
+            self.frames_read += 1
+            yield idx, pos, self.frame
+
+    def stop(self):
+        pass
+
+class ReplayPipeline:
+    """Substitui o DetectionPipeline no replay: entrega (índice, posição_ms, frame, detecções)
+    com as detecções do cache, casadas pelo índice do frame"""
+    def __init__(self, frames, cache):
+        self.frames = frames
+        self.cache = cache
+        self.batch_size = 1
+        self.detect_every = cache.meta.get("detect_every", 1)
+        self.frames_processed = 0
+        self.frames_gated = 0
+        self.keyframes = 0
+        self.batches = 0
+        self.gate_s = Timings()
+        self.propagate_s = Timings()
+
+    def __iter__(self):
+        index = {idx: i for i, idx in enumerate(self.cache.frame_idx.tolist())}
+        for pkt in self.frames:
+            i = index.get(pkt[0])
+            if i is None:
+                raise ValueError(f"Frame {pkt[0]} não está no cache {self.cache.path}")
+            self.frames_processed += 1
+            yield (*pkt, self.cache.detections(i))
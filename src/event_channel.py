@@ -0,0 +1,78 @@
+# src/event_channel.py
+"""Canal de registros do analisador para quem o executa (API, pool, terminal).
+
+Cada registro é um dict com "type" e campos próprios do tipo, mais "msg" com o texto
+legível que o analisador sempre imprimiu:
+  log      — {"level": "info"|"ok"|"erro"|..., "msg"}
+  person   — nova pessoa: {"camera", "pid"}
+  event    — regra disparada: {"camera", "pid", "event" (event_type do banco), "roi"}
+  object   — objeto: {"camera", "pid", "action" (pegar/soltar/segurar), "roi"}
+  checkout — {"camera", "pid", "checkout", "propensity", "score"}
+  propensity — score do track mudou: {"camera", "pid", "level", "score", "signals"} (sem msg)
+  stats    — {"name", "value"}
+  progress — {"frames", "position_s", "duration_s"} (sem msg)
+  done     — fim da análise: {"total_customers", "total_events", ...} (resumo da execução)
+"""
+import json, sys
+
+class TextChannel:
+    """Padrão do terminal: só imprime o texto dos registros, como antes"""
+    def send(self, record):
+        msg = record.get("msg")
+        if msg:
+            print(msg)
+
+class JsonLinesChannel:
+    """Um JSON por linha no stream (--events jsonl), para um processo pai ler sem interpretar texto"""
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def send(self, record):
+        self.stream.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self.stream.flush()
+
+class QueueChannel:
+    """Registros enviados como dicts por uma fila de multiprocessing (workers do AnalyzerPool)"""
+    def __init__(self, out_q, name, job_id):
+        self.out_q = out_q
+        self.name = name
+        self.job_id = job_id
+
+    def send(self, record):
+        self.out_q.put((self.name, self.job_id, "record", record))
+
+_channel = TextChannel()
+
+def set_channel(channel):
+    """Troca o canal do processo e devolve o anterior"""
+    global _channel
+    previous, _channel = _channel, channel or TextChannel()
+    return previous
+
+def emit(type_, msg=None, **fields):
+    record = {"type": type_, **fields}
+    if msg is not None:
+        record["msg"] = msg
+    _channel.send(record)
+
+def parse_line(line):
+    """Registro de uma linha da saída do analisador: JSON (--events jsonl) ou texto solto
+    (prints fora do canal, erros do Python), que vira um log"""
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith("{"):
+        try:
+            return json.loads(line)
+        except ValueError:
+            pass
+    # Nível pela tag do print ("[ERRO] ...", "[OK] ...", "[STATS] ..."); sem tag = info
+    level = line[1:line.index("]")].lower() if line.startswith("[") and "]" in line else "info"
+    return {"type": "log", "level": level, "msg": line}
+
+def read_records(stream):
+    """Registros da saída de um subprocess (stdout em modo texto)"""
+    for line in iter(stream.readline, ""):
+        record = parse_line(line)
+        if record is not None:
+            yield record
@@ -15,6 +15,8 @@ from fastapi.staticfiles import StaticFiles
 import oracledb
 from db_oracle import _connect, log_video_analysis, get_total_video_duration
 from utils.logger import upload_logger
+from analyzer_pool import AnalyzerPool
+from event_channel import read_records
 from pydantic import BaseModel
 
 # Definindo modelos para os dados
@@ -104,6 +106,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Pool de analisadores com o modelo já carregado (ANALYZER_WORKERS=0 volta a usar um subprocess por análise)
+ANALYZER_WORKERS = int(os.getenv("ANALYZER_WORKERS", "1"))
+# Runtime do modelo nos workers: auto, openvino, onnx ou torch (ANALYZER_INT8=1 quantiza o exportado)
+ANALYZER_BACKEND = os.getenv("ANALYZER_BACKEND", "auto")
+ANALYZER_INT8 = os.getenv("ANALYZER_INT8", "0") == "1"
+analyzer_pool = None
+
+@app.on_event("startup")
+async def start_analyzer_pool():
+    global analyzer_pool
+    if ANALYZER_WORKERS > 0:
+        analyzer_pool = AnalyzerPool(ANALYZER_WORKERS, ANALYZER_BACKEND, ANALYZER_INT8)
+        print(f"Pool de análise iniciado com {ANALYZER_WORKERS} worker(s), backend {ANALYZER_BACKEND}{' INT8' if ANALYZER_INT8 else ''}")
+
+@app.on_event("shutdown")
+async def stop_analyzer_pool():
+    if analyzer_pool is not None:
+        analyzer_pool.shutdown()
+
 @app.get("/")
 async def root():
     return {"message": "Bem-vindo à API do projeto!"}
@@ -544,6 +565,8 @@ class AnalysisSession:
         }
         self.duration_seconds = 30  # 30 segundos de análise para demonstração
         self.data_saved = False
+        self.performance = None  # relatório de desempenho do analisador (registro "report")
+        self.propensity = {}  # pid -> {"level", "score", "signals"} (registros "propensity")
 
     def is_completed(self):
         import time
@@ -631,117 +654,94 @@ async def analyze_behavior(request: BehaviorAnalysisRequest):
                     "python", "mvp_store_ai.py",
                     "--video", video_path,
                     "--rois", rois_file,
-                    "--camera-id", "cam01"
+                    "--camera-id", "cam01",
+                    "--headless",
+                    "--events", "jsonl"
                 ]
                 
                 print(f"Executando análise real: {' '.join(cmd)}")
                 
-                # Usar Popen para capturar logs em tempo real
-                process = subprocess.Popen(
-                    cmd, 
-                    stdout=subprocess.PIPE, 
-                    stderr=subprocess.STDOUT,
-                    text=True, 
-                    bufsize=1,  # Line buffered
-                    universal_newlines=True,
-                    cwd="."
-                )
+                if analyzer_pool is not None and analyzer_pool.available:
+                    # Worker já aquecido: registros chegam como dicts pela fila do pool
+                    process = analyzer_pool.submit(cmd[2:])
+                    records = process.records()
+                else:
+                    # Subprocess com --events jsonl: um registro JSON por linha do stdout
+                    process = subprocess.Popen(
+                        cmd, 
+                        stdout=subprocess.PIPE, 
+                        stderr=subprocess.STDOUT,
+                        text=True, 
+                        bufsize=1,  # Line buffered
+                        universal_newlines=True,
+                        cwd="."
+                    )
+                    records = read_records(process.stdout)
                 
                 total_customers = 0
                 total_interactions = 0
                 detected_persons = set()
+                fallback_interactions = 0
+                done = None
                 
-                # Processar logs em tempo real linha por linha
-                for line in iter(process.stdout.readline, ''):
-                    line = line.strip()
-                    if not line:
+                # Registros tipados do analisador (event_channel), em tempo real
+                for record in records:
+                    kind = record.get("type")
+                    if kind == "progress":
+                        if record.get("duration_s"):
+                            session.progress = min(99, 100 * record["position_s"] / record["duration_s"])
                         continue
-                        
-                    print(f"Log capturado: {line}")  # Debug
+                    if kind == "report":
+                        session.performance = record["report"]
+                        continue
+                    if kind == "propensity":
+                        session.propensity[record["pid"]] = {"level": record["level"], "score": record["score"],
+                                                             "signals": record["signals"]}
+                        continue
+                    if kind == "done":
+                        done = record
+                        total_customers = record["total_customers"]
+                        total_interactions = record["total_events"]
+                        session.status = "completed"
+                        session.progress = 100
+                        break
                     
                     # Extrair estatísticas
-                    if "[STATS] TOTAL_CUSTOMERS:" in line:
-                        total_customers = int(line.split("TOTAL_CUSTOMERS: ")[1])
-                    elif "[STATS] TOTAL_INTERACTIONS:" in line:
-                        total_interactions = int(line.split("TOTAL_INTERACTIONS: ")[1])
-                    elif "[INFO] Nova pessoa detectada:" in line:
-                        # Extrair ID da pessoa (fallback)
-                        person_id = line.split("detectada: ")[1].split(" -")[0]
-                        detected_persons.add(person_id)
-                    elif "[EVENT]" in line and ("permanencia" in line or "GAZE" in line or "HOLD" in line):
-                        # Contar eventos (fallback)
-                        if total_interactions == 0:  # Só usar se não tiver stats diretas
-                            total_interactions += 1
-                    
-                    # Processar TODOS os logs detalhados para o frontend
-                    current_time = datetime.now()
-                    timestamp = current_time.strftime("%H:%M:%S")
+                    if kind == "stats":
+                        if record["name"] == "TOTAL_CUSTOMERS":
+                            total_customers = record["value"]
+                        elif record["name"] == "TOTAL_INTERACTIONS":
+                            total_interactions = record["value"]
+                    elif kind == "person":
+                        detected_persons.add(record["pid"])  # fallback
+                    elif kind == "event" and record["event"] != "entrar_loja":
+                        fallback_interactions += 1
                     
-                    # Capturar TODOS os logs do Python e enviá-los para o frontend
-                    log_type = "info"  # Tipo padrão
-                    message = line  # Mensagem original do Python
-                    
-                    # Determinar o tipo de log baseado no conteúdo
-                    if "[INFO]" in line:
-                        if "Nova pessoa detectada:" in line:
-                            log_type = "customer_entry"
-                            person_id = line.split("detectada: ")[1].split(" -")[0] if "detectada: " in line else "desconhecido"
-                            message = f"👤 {line}"
-                        elif "Áreas de carrinho:" in line:
-                            log_type = "info"
-                            message = f"🛒 {line}"
-                        elif "Processando video" in line:
-                            log_type = "info"
-                            message = f"🎬 {line}"
-                        else:
-                            log_type = "info"
-                            message = f"ℹ️ {line}"
-                    elif "[EVENT]" in line:
-                        if "entrou na loja" in line:
-                            log_type = "customer_entry"
-                            message = f"🚪 {line}"
-                        elif "soltou objeto" in line:
-                            log_type = "product_interaction"
-                            message = f"📤 {line}"
-                        else:
-                            log_type = "product_interaction"
-                            message = f"🎯 {line}"
-                    elif "[OBJECT]" in line:
-                        if "pegou objeto" in line:
-                            log_type = "product_interaction"
-                            message = f"🤏 {line}"
-                        elif "segurando objeto" in line:
-                            log_type = "product_interaction"
-                            message = f"✋ {line}"
-                        else:
-                            log_type = "product_interaction"
-                            message = f"📦 {line}"
-                    elif "[STATS]" in line:
-                        log_type = "info"
-                        message = f"📊 {line}"
-                    elif "[OK]" in line:
-                        log_type = "info"
-                        message = f"✅ {line}"
+                    message = record.get("msg")
+                    if not message:
+                        continue
+                    # Tipo e ícone do log para o frontend
+                    if kind == "person":
+                        log_type, icon = "customer_entry", "👤"
+                    elif kind == "event":
+                        log_type, icon = ("customer_entry", "🚪") if record["event"] == "entrar_loja" else ("product_interaction", "🎯")
+                    elif kind == "object":
+                        log_type, icon = "product_interaction", {"pegar": "🤏", "soltar": "📤", "segurar": "✋"}.get(record["action"], "📦")
+                    elif kind == "checkout":
+                        log_type, icon = "product_interaction", "🛒"
+                    elif kind == "stats" or record.get("level") == "stats":
+                        log_type, icon = "info", "📊"
+                    elif record.get("level") == "ok":
+                        log_type, icon = "info", "✅"
+                    elif record.get("level") == "erro":
+                        log_type, icon = "error", "❌"
                     else:
-                        # Qualquer outro log do Python
-                        log_type = "info"
-                        message = f"🔍 {line}"
-                    
-                    # Adicionar o log à sessão (apenas se não estiver vazio)
-                    if message.strip():
-                        session.logs.append({
-                            "timestamp": timestamp,
-                            "type": log_type,
-                            "message": message
-                        })
-                        
-                        # Detectar mensagem "Total" para finalizar análise automaticamente
-                        if "[INFO] Total:" in line:
-                            print(f"Detectada mensagem de conclusão: {line}")
-                            # Marcar análise como concluída
-                            session.status = "completed"
-                            session.progress = 100
-                            break  # Sair do loop de leitura
+                        log_type, icon = "info", "ℹ️"
+                    session.logs.append({
+                        "timestamp": datetime.now().strftime("%H:%M:%S"),
+                        "type": log_type,
+                        "message": f"{icon} {message}"
+                    })
                 
                 # Aguardar o processo terminar
                 process.wait()
@@ -752,6 +752,8 @@ async def analyze_behavior(request: BehaviorAnalysisRequest):
                     # Fallback para contagem manual se stats não foram encontradas
                     if total_customers == 0:
                         total_customers = len(detected_persons)
+                    if total_interactions == 0:
+                        total_interactions = fallback_interactions
                     
                     # Atualizar estatísticas baseadas na análise real
                     session.stats["total_customers"] = total_customers
@@ -772,8 +774,9 @@ async def analyze_behavior(request: BehaviorAnalysisRequest):
                         },
                         {
                             "timestamp": completion_time.strftime("%H:%M:%S"),
-                            "type": "info",
-                            "message": "💾 Dados salvos no banco Oracle com sucesso"
+                            "type": "info" if done and done.get("saved") else "error",
+                            "message": "💾 Dados salvos no banco Oracle com sucesso" if done and done.get("saved")
+                                       else "❌ Dados da análise não foram salvos no banco"
                         }
                     ])
                     
@@ -883,7 +886,9 @@ async def get_analysis_status(video_filename: str):
                 "final_stats": session.stats,
                 "completion_log": completion_log,
                 "all_logs": session.logs,  # Incluir todos os logs da sessão
-                "progress": 100
+                "progress": 100,
+                "propensity": session.propensity,
+                "performance": session.performance
             }
         
         # Análise ainda em andamento - mostrar progresso real
@@ -909,6 +914,7 @@ async def get_analysis_status(video_filename: str):
                 "status": "analyzing",
                 "new_log": None,  # Não enviar logs mockados
                 "updated_stats": session.stats,
+                "propensity": session.propensity,
                 "progress": progress,
                 "timestamp": current_time.isoformat()
             }
@@ -921,6 +927,7 @@ async def get_analysis_status(video_filename: str):
                 "new_log": latest_log,
                 "new_logs": new_logs,  # Enviar todos os novos logs
                 "updated_stats": session.stats,
+                "propensity": session.propensity,
                 "progress": progress,
                 "timestamp": current_time.isoformat()
             }
@@ -0,0 +1,161 @@
+# src/multi_camera.py
+import argparse, os, sys, time
+import cv2
+
+from batch_analyze import load_jobs
+from event_channel import JsonLinesChannel, emit, set_channel
+from mvp_store_ai import (build_arg_parser, load_pose_model, load_rois, open_sink, close_sink,
+                          CameraAnalyzer, make_pose_tracker, stop_on_sigterm, tracker_frame_rate)
+from tracking import DetectionPipeline, MotionGate, MultiCameraPipeline
+from video_io import FrameReader, LiveFrameReader, MediaClock, parse_start_time
+from db_oracle import StreamingWriter, _ts
+
+class CameraSource:
+    """Uma câmera do processo: leitor, relógio, pipeline de detecção e motor de regras próprios"""
+    def __init__(self, job, args, model, sink):
+        self.job = job
+        self.args = args
+        self.live = args.live or args.simulate_live
+        self.rois, cart_areas, checkout_areas = load_rois(args, args.roi_key or os.path.basename(args.video))
+        if self.live:
+            self.reader = LiveFrameReader(args.video, simulate=args.simulate_live,
+                                          reconnect_delay=args.reconnect_delay, max_reconnects=args.max_reconnects)
+            self.cap = self.reader.cap
+        else:
+            self.cap = cv2.VideoCapture(args.video)
+        video_fps = self.cap.get(cv2.CAP_PROP_FPS)
+        stride = max(1, args.stride)
+        if args.target_fps and video_fps > 0:
+            stride = max(1, int(round(video_fps / args.target_fps)))
+        if self.live:
+            stride = 1
+            self.clock = MediaClock(video_fps, self.reader.start_wall)
+        else:
+            self.reader = FrameReader(self.cap, args.prefetch, stride)
+            self.clock = MediaClock(video_fps, parse_start_time(args.video_start))
+        gate = MotionGate(self.rois, min_fraction=args.motion_thresh, max_skip=args.motion_max_skip) if args.motion_gate else None
+        # Cada câmera tem o próprio ByteTrack; o modelo é o mesmo para todas
+        pose_tracker = make_pose_tracker(args, model, self.rois, self.cap, tracker_frame_rate(self.clock, stride, args.detect_every))
+        self.pipeline = DetectionPipeline(self.reader, pose_tracker, 1, args.detect_every, gate)
+        self.camera = CameraAnalyzer(args, args.camera_id, self.rois, cart_areas, checkout_areas, self.clock, stride, sink,
+                                     pose_tracker.tracker.max_time_lost * self.pipeline.detect_every)
+
+    def close(self):
+        self.reader.stop()
+        self.cap.release()
+
+def camera_args(job, analyzer_argv):
+    argv = ["--video", job["video"], "--camera-id", job["camera_id"], "--headless", *analyzer_argv]
+    for key, opt in (("video_start", "--video-start"), ("roi_key", "--roi-key")):
+        if job.get(key):
+            argv += [opt, str(job[key])]
+    if job.get("live"):
+        argv.append("--live")
+    return build_arg_parser().parse_args(argv)
+
+def main():
+    ap = argparse.ArgumentParser(description="Análise de várias câmeras num único processo, com um só modelo e "
+                                             "inferência em lote entre câmeras. Opções não reconhecidas são "
+                                             "repassadas ao mvp_store_ai.py (valem para todas as câmeras).")
+    ap.add_argument("--sources", required=True,
+                    help="Manifesto .json com {\"video\", \"camera_id\", \"roi_key\", \"video_start\", \"live\"} "
+                         "por câmera (ou diretório de vídeos)")
+    ap.add_argument("--rois", default="rois.json")
+    ap.add_argument("--no-db", action="store_true", help="Apenas analisa e mostra o resumo, sem gravar no banco")
+    args, analyzer_argv = ap.parse_known_args()
+    stop_on_sigterm()
+
+    jobs = load_jobs(args.sources)
+    if not jobs:
+        print(f"[ERRO] Nenhuma câmera encontrada em {args.sources}")
+        return
+    ids = [job["camera_id"] for job in jobs]
+    if len(set(ids)) != len(ids):
+        print(f"[ERRO] camera_id repetido no manifesto: {ids}")
+        return
+    cam_args = [camera_args(job, ["--rois", args.rois, *analyzer_argv]) for job in jobs]
+    base = cam_args[0]
+    if base.events == "jsonl":
+        set_channel(JsonLinesChannel(sys.stdout))
+
+    model = load_pose_model(base.backend, base.int8)
+    sink = open_sink(base, persist=not args.no_db)
+    sources = []
+    try:
+        for job, a in zip(jobs, cam_args):
+            print(f"[INFO] Câmera {job['camera_id']}: {job['video']}")
+            try:
+                sources.append(CameraSource(job, a, model, sink))
+            except Exception as e:
+                print(f"[ERRO] {job['video']}: {e}")
+    except BaseException:
+        # Interrompido no meio da abertura: fecha as câmeras já abertas e a conexão do writer
+        for src in sources:
+            src.close()
+        if isinstance(sink, StreamingWriter):
+            sink.close()
+        raise
+    if not sources:
+        if isinstance(sink, StreamingWriter):
+            sink.close()
+        return
+    for src in sources:
+        print(f"[INFO] {src.job['camera_id']}: relógio de mídia {src.clock.fps:.2f} fps, início {_ts(src.clock.start_epoch).isoformat()}")
+
+    # Um frame de cada câmera por rodada; os keyframes da rodada vão juntos para o modelo
+    multi = MultiCameraPipeline(model, [s.pipeline for s in sources], imgsz=base.imgsz)
+    print(f"[INFO] Processando {len(sources)} câmeras com um modelo compartilhado...")
+    t_start = time.time()
+    try:
+        for cam, (frame_idx, pos_msec, frame, det) in multi:
+            sources[cam].camera.process(frame_idx, pos_msec, frame, det)
+    except KeyboardInterrupt:
+        print("[INFO] Interrompido; finalizando as câmeras")
+    except BaseException:
+        # Erro no meio da análise: ainda fecha as sessões abertas de cada câmera e descarrega
+        # a fila do writer antes de propagar, como o analyze_video
+        try:
+            for src in sources:
+                try:
+                    src.camera.finish()
+                except Exception as e:
+                    print(f"[ERRO] Falha ao finalizar a câmera {src.job['camera_id']}: {e}")
+        finally:
+            if isinstance(sink, StreamingWriter):
+                close_sink(sink)
+        raise
+    finally:
+        for src in sources:
+            src.close()
+    elapsed = time.time() - t_start
+
+    streaming = isinstance(sink, StreamingWriter)
+    total_customers = total_events = frames = 0
+    try:
+        for src in sources:
+            cid = src.job["camera_id"]
+            parquet_dir = os.path.join(src.args.record_parquet, cid) if src.args.record_parquet else None
+            stats = src.camera.finish(parquet_dir)
+            total_customers += stats["customers"]
+            total_events += stats["events"]
+            frames += src.reader.frames_read
+            extra = f", {src.reader.frames_dropped} descartados" if src.live else ""
+            print(f"[STATS] CAMERA {cid}: {src.reader.frames_read} frames{extra}, {src.pipeline.keyframes} keyframes, "
+                  f"{stats['customers']} clientes, {stats['events']} eventos")
+    finally:
+        if streaming:
+            close_sink(sink)
+    print(f"[INFO] {frames} frames de {len(sources)} câmeras em {elapsed:.1f}s ({frames / max(elapsed, 1e-6):.1f} fps); "
+          f"{sum(s.pipeline.keyframes for s in sources)} keyframes em {multi.batches} lotes")
+    print(f"[STATS] CAMERAS: {len(sources)}/{len(jobs)}")
+    emit("stats", f"[STATS] TOTAL_CUSTOMERS: {total_customers}", name="TOTAL_CUSTOMERS", value=total_customers)
+    emit("stats", f"[STATS] TOTAL_INTERACTIONS: {total_events}", name="TOTAL_INTERACTIONS", value=total_events)
+
+    if not streaming and not args.no_db:
+        print("[ERRO] Banco indisponível; linhas não foram salvas")
+    emit("done", cameras=[s.job["camera_id"] for s in sources], frames=frames, elapsed_s=elapsed,
+         total_customers=total_customers, total_events=total_events,
+         saved=streaming and not sink.rows_failed, rows_written=sink.rows_written if streaming else 0)
+
+if __name__ == "__main__":
+    main()
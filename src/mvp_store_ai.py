@@ -1,11 +1,22 @@
 # src/mvp_store_ai.py
-import argparse, json, os, time, math
+import argparse, json, os, signal, sys, time, math
+from collections import deque
 import cv2
 import numpy as np
-from ultralytics import YOLO
 from dotenv import load_dotenv; load_dotenv()
 
-from db_oracle import init_db, log_event, log_path, upsert_session, log_customer_object, log_purchase_validation, save_analysis_data_batch, _ts
+from annotation import RoiLayer, AsyncAnnotatedWriter, draw_overlay
+from video_io import FrameReader, LiveFrameReader, MediaClock, parse_start_time
+from tracking import DetectionPipeline, MotionGate, PoseTracker, roi_crop_box
+from roi_index import RoiIndex
+from pose_rules import PoseRules
+from trajectory import PATH_MODES, TrajectoryConfig, TrajectoryCompressor
+from recorder import ColumnarRecorder, PersonRows, StringTable
+from pose_model import BACKENDS, POSE_WEIGHTS, load_pose_model, resolve_backend
+from detection_cache import CACHE_MODES, CachedFrames, DetectionCache, DetectionCacheWriter, ReplayPipeline, cache_path, exists as cache_exists
+from event_channel import JsonLinesChannel, emit, set_channel
+from profiler import RunProfiler, now
+from db_oracle import init_db, log_event, log_path, upsert_session, log_customer_object, log_purchase_validation, StreamingWriter, _ts
 
 def point_in_poly(pt, poly_np):
     return cv2.pointPolygonTest(poly_np, (float(pt[0]), float(pt[1])), False) >= 0
@@ -17,6 +28,16 @@ def box_center(xyxy):
 def euclid(a,b):
     return math.hypot(a[0]-b[0], a[1]-b[1])
 
+def scale_frames(n, stride):
+    """Converte um limiar em frames do vídeo original para frames analisados (com stride)"""
+    return max(1, int(round(n / stride)))
+
+def latency_summary(latencies):
+    if not latencies:
+        return "sem frames"
+    ms = sorted(1000.0 * x for x in latencies)
+    return f"média {sum(ms) / len(ms):.0f} ms, p95 {ms[int(0.95 * (len(ms) - 1))]:.0f} ms, máx {ms[-1]:.0f} ms"
+
 def clean_poly(points):
     if len(points) >= 2 and tuple(points[0]) == tuple(points[-1]):
         points = points[:-1]
@@ -30,116 +51,59 @@ def assign_customer_tag(person_state):
         person_state.tag_color = colors[hash(person_state.pid) % len(colors)]
         person_state.tag_assigned = True
 
-def detect_gaze_direction(keypoints, roi_center):
-    """Detecta se a pessoa está olhando para uma ROI baseado na pose da cabeça"""
-    if keypoints is None or len(keypoints) < 5:
-        return False
-    
-    # Pontos da cabeça: nose(0), left_eye(1), right_eye(2), left_ear(3), right_ear(4)
-    nose = keypoints[0]
-    left_eye = keypoints[1]
-    right_eye = keypoints[2]
-    
-    if nose[0] <= 0 or nose[1] <= 0 or left_eye[0] <= 0 or right_eye[0] <= 0:
-        return False
-    
-    # Calcular direção do olhar baseado na orientação da cabeça
-    eye_center = ((left_eye[0] + right_eye[0]) / 2, (left_eye[1] + right_eye[1]) / 2)
-    head_direction = (nose[0] - eye_center[0], nose[1] - eye_center[1])
-    
-    # Vetor da cabeça para a ROI
-    to_roi = (roi_center[0] - nose[0], roi_center[1] - nose[1])
-    
-    # Calcular ângulo (simplificado)
-    dot_product = head_direction[0] * to_roi[0] + head_direction[1] * to_roi[1]
-    head_mag = math.hypot(head_direction[0], head_direction[1])
-    roi_mag = math.hypot(to_roi[0], to_roi[1])
-    
-    if head_mag == 0 or roi_mag == 0:
-        return False
-    
-    cos_angle = dot_product / (head_mag * roi_mag)
-    # Se o ângulo for menor que 45 graus, considera que está olhando
-    return cos_angle > 0.7  # cos(45°) ≈ 0.707
-
-def detect_object_in_hands(keypoints, roi_polygons):
-    """Detecta se há objeto nas mãos baseado na posição dos punhos"""
-    if keypoints is None or len(keypoints) < 11:
-        return False, None
-    
-    # Punhos: left_wrist(9), right_wrist(10)
-    left_wrist = keypoints[9]
-    right_wrist = keypoints[10]
-    
-    # Verificar se os punhos estão em posição de segurar objeto
-    for roi_name, roi_poly in roi_polygons.items():
-        # Se os punhos estão próximos e em posição elevada (segurando algo)
-        if (left_wrist[0] > 0 and left_wrist[1] > 0 and 
-            right_wrist[0] > 0 and right_wrist[1] > 0):
-            
-            wrist_distance = euclid(left_wrist, right_wrist)
-            # Se os punhos estão próximos (segurando algo)
-            if 20 < wrist_distance < 100:
-                return True, roi_name
-    
-    return False, None
-
-def detect_cart_interaction(keypoints, person_center, cart_areas):
-    """Detecta interação com carrinho de compras"""
-    if keypoints is None or not cart_areas:
-        return False
-    
-    # Verificar se a pessoa está próxima de uma área de carrinho
-    for cart_area in cart_areas:
-        if point_in_poly(person_center, cart_area):
-            # Verificar movimento das mãos indicando colocação de item
-            left_wrist = keypoints[9] if len(keypoints) > 9 else None
-            right_wrist = keypoints[10] if len(keypoints) > 10 else None
-            
-            if (left_wrist and left_wrist[0] > 0 and left_wrist[1] > 0 and
-                right_wrist and right_wrist[0] > 0 and right_wrist[1] > 0):
-                # Verificar se as mãos estão em movimento descendente (colocando algo)
-                wrist_distance = euclid(left_wrist, right_wrist)
-                # Movimento típico de colocação no carrinho
-                if wrist_distance > 30:  # Mãos separadas indicando colocação
-                    return True
-    
-    return False
+# Sinais de propensão de compra: (tipo_evento, método em extra ou None = qualquer, pontos, nome)
+PROPENSITY_SIGNALS = (
+    ("permanencia_baixa", "gaze_detection", 1, "olhar_prateleira"),
+    ("alcance_medio", "object_holding", 2, "segurar_objeto"),
+    ("colocar_carrinho_alta", None, 3, "colocar_carrinho"),
+)
+
+def propensity_level(score):
+    if score >= 5:
+        return 'ALTA'
+    elif score >= 3:
+        return 'MEDIA'
+    elif score >= 1:
+        return 'BAIXA'
+    return 'NENHUMA'
 
 class PersonState:
-    def __init__(self, pid):
+    """Estado de um track. Memória limitada por pessoa: janelas em buffers circulares,
+    uma única sessão corrente e contadores no lugar de históricos por frame."""
+    __slots__ = (
+        "pid", "first_ts", "last_ts", "frame_count", "roi_enter_ts", "reach_frames", "post_reach_ref", "fired",
+        "rows", "purchase_validations", "path", "session_ts", "propensity_score", "propensity_signals", "propensity_reported",
+        "holding_object", "object_picked_from", "object_pick_ts", "tag_color", "tag_assigned",
+        "last_gaze_log", "log_cooldown", "gaze_start_time", "gaze_confirmed", "min_gaze_time",
+        "object_detection_buffer", "object_positive", "buffer_size", "stable_object_state", "stable_object_roi",
+        "fired_hold", "fired_pick", "fired_drop", "state_change_cooldown", "last_state_change", "current_interaction_id",
+    )
+
+    def __init__(self, pid, buffer_size=10, path_cfg=None, rows=None):
         self.pid = pid
         self.first_ts = None
         self.last_ts = None
-        self.center_hist = []
+        # Contador de frames para filtrar detecções falsas
+        self.frame_count = 0
         self.roi_enter_ts = {}
         self.reach_frames = {}
         self.post_reach_ref = {}
         self.fired = set()
-        # Dados coletados para salvar depois
-        self.events = []
-        self.paths = []
-        self.sessions = []
-        self.customer_objects = []
+        # Eventos e objetos para salvar depois, em colunas (recorder.PersonRows; não crescem por frame)
+        self.rows = rows if rows is not None else PersonRows(StringTable())
         self.purchase_validations = []
-        # Contador de frames para filtrar detecções falsas
-        self.frame_count = 0
+        # Propensão acumulada à medida que os eventos chegam (sinais já pontuados)
+        self.propensity_score = 0
+        self.propensity_signals = set()
+        self.propensity_reported = 0  # último score enviado no registro "propensity"
+        # Caminho comprimido à medida que as posições chegam
+        self.path = TrajectoryCompressor(path_cfg)
+        # Sessão corrente: só o último timestamp é gravado
+        self.session_ts = None
         
-        # Novos estados para comportamentos avançados
-        self.gaze_start_ts = {}  # Quando começou a olhar para cada ROI
-        self.gaze_duration = {}  # Duração do olhar em cada ROI
         self.holding_object = False
         self.object_picked_from = None
         self.object_pick_ts = None
-        self.cart_interactions = []
-        self.propensity_level = None  # 'low', 'medium', 'high'
-        self.predicted_items = []  # Items que a IA prevê que o cliente vai comprar
-        self.is_at_checkout = False
-        self.checkout_start_ts = None
-        
-        # Tracking de pose para detecção de olhar
-        self.head_direction_hist = []
-        self.hand_positions_hist = []
         
         # TAG visual persistente
         self.tag_color = None
@@ -147,7 +111,6 @@ class PersonState:
         
         # Controles de debounce para logs
         self.last_gaze_log = {}
-        self.last_object_log = {}
         self.log_cooldown = 2.0  # 2 segundos entre logs similares
         
         # Controle de tempo mínimo para GAZE (4 segundos)
@@ -155,9 +118,10 @@ class PersonState:
         self.gaze_confirmed = {}   # ROI -> se já foi confirmado o olhar
         self.min_gaze_time = 4.0   # 4 segundos mínimos para confirmar olhar
         
-        # Buffer para estabilizar detecção de objetos
-        self.object_detection_buffer = []
-        self.buffer_size = 10  # Número de frames para confirmar mudança de estado
+        # Buffer circular para estabilizar detecção de objetos, com contagem de positivos
+        self.object_detection_buffer = deque(maxlen=buffer_size)
+        self.object_positive = 0
+        self.buffer_size = buffer_size  # Número de frames para confirmar mudança de estado
         self.stable_object_state = False
         self.stable_object_roi = None
         self.fired_hold = {}  # Controle para evitar múltiplos eventos de segurar
@@ -167,7 +131,35 @@ class PersonState:
         self.last_state_change = 0
         self.current_interaction_id = None  # ID único para cada interação com objeto
 
-def main():
+    def add_event(self, ts, event_type, roi_id, conf, extra=None):
+        """Registra um evento nas colunas da pessoa e atualiza a propensão em O(1)"""
+        self.rows.add_event(ts, event_type, roi_id, conf, extra)
+        method = (extra or {}).get('method')
+        for signal_type, signal_method, points, name in PROPENSITY_SIGNALS:
+            if (event_type == signal_type and signal_method in (None, method)
+                    and name not in self.propensity_signals):
+                self.propensity_signals.add(name)
+                self.propensity_score += points
+
+    def add_object(self, ts, object_type, roi_id, action, conf):
+        self.rows.add_object(ts, object_type, roi_id, action, conf)
+
+    def propensity(self):
+        """(nível, score, sinais) da propensão atual do track"""
+        signals = [name for _, _, _, name in PROPENSITY_SIGNALS if name in self.propensity_signals]
+        return propensity_level(self.propensity_score), self.propensity_score, signals
+
+    def add_path(self, ts, c, roi):
+        self.path.add(ts, c[0], c[1], self.rows.strings.code(roi))
+
+    def add_object_detection(self, detected, roi):
+        buf = self.object_detection_buffer
+        if len(buf) == buf.maxlen and buf[0][0]:
+            self.object_positive -= 1
+        buf.append((detected, roi))
+        self.object_positive += bool(detected)
+
+def build_arg_parser():
     ap = argparse.ArgumentParser()
     ap.add_argument("--video", required=True)
     ap.add_argument("--rois", default="rois.json")
@@ -181,12 +173,63 @@ def main():
     ap.add_argument("--hold-frames", type=int, default=15, help="Frames segurando objeto (média propensão)")
     ap.add_argument("--cart-area", default="cart", help="Nome da ROI do carrinho")
     ap.add_argument("--checkout-area", default="checkout", help="Nome da ROI do caixa")
-    args = ap.parse_args()
-
-    # Carregar ROIs
+    # Execução sem interface gráfica (servidor) e vídeo anotado opcional
+    ap.add_argument("--headless", action="store_true", help="Não abre janela nem desenha overlay na tela")
+    ap.add_argument("--annotated-out", default=None, help="Caminho do vídeo anotado (renderizado em thread separada)")
+    ap.add_argument("--prefetch", type=int, default=4, help="Frames decodificados à frente da inferência (0 = leitura síncrona)")
+    ap.add_argument("--video-start", default=None, help="Início da gravação (epoch ou ISO 8601) usado em data_hora; padrão: agora")
+    # Analisar só parte dos frames (limiares em frames são reescalados automaticamente)
+    ap.add_argument("--live", action="store_true", help="--video é uma câmera ao vivo (URL RTSP/HTTP ou índice do dispositivo)")
+    ap.add_argument("--simulate-live", action="store_true", help="Reproduz o arquivo de --video no FPS nativo como se fosse uma câmera ao vivo")
+    ap.add_argument("--roi-key", default=None, help="Chave do rois.json (padrão: nome do arquivo de --video)")
+    ap.add_argument("--reconnect-delay", type=float, default=2.0, help="Segundos entre tentativas de reconexão do stream")
+    ap.add_argument("--max-reconnects", type=int, default=-1, help="Máximo de reconexões do stream (-1 = sem limite)")
+    ap.add_argument("--stride", type=int, default=1, help="Roda a inferência a cada N frames decodificados")
+    ap.add_argument("--target-fps", type=float, default=None, help="FPS de análise desejado (define o stride a partir do FPS do vídeo)")
+    ap.add_argument("--detect-every", type=int, default=1, help="Roda o modelo a cada N frames analisados e propaga as posições por fluxo óptico entre eles")
+    ap.add_argument("--batch", type=int, default=1, help="Keyframes por chamada de inferência (lote, para vídeos offline)")
+    ap.add_argument("--imgsz", type=int, default=None, help="Resolução de entrada do modelo (padrão do YOLO: 640)")
+    ap.add_argument("--roi-crop", action="store_true", help="Roda o modelo só no retângulo que envolve as ROIs (com margem --roi-pad)")
+    ap.add_argument("--roi-pad", type=int, default=64, help="Margem em pixels ao redor das ROIs no modo --roi-crop")
+    ap.add_argument("--motion-gate", action="store_true", help="Pula a inferência em keyframes sem movimento na área das ROIs")
+    ap.add_argument("--motion-thresh", type=float, default=0.005, help="Fração dos pixels das ROIs que precisa mudar para rodar o modelo")
+    ap.add_argument("--evict-after", type=float, default=10.0, help="Segundos (do vídeo) sem ver um track para finalizá-lo e liberar a memória")
+    ap.add_argument("--path-mode", choices=PATH_MODES, default="dp", help="Compressão de caminhos_cliente: dp (Douglas-Peucker), distance ou sample (1 a cada N)")
+    ap.add_argument("--path-eps", type=float, default=8.0, help="Erro máximo em pixels do modo dp")
+    ap.add_argument("--path-min-dist", type=float, default=25.0, help="Deslocamento mínimo em pixels do modo distance")
+    ap.add_argument("--path-max-gap", type=float, default=2.0, help="Segundos máximos sem gravar posição nos modos dp/distance (0 = sem limite)")
+    ap.add_argument("--path-every", type=int, default=20, help="Amostragem do modo sample (1 a cada N posições)")
+    ap.add_argument("--record-parquet", default=None, help="Diretório para exportar as linhas da análise em Parquet (requer pyarrow)")
+    ap.add_argument("--db-batch-rows", type=int, default=500, help="Linhas acumuladas antes de cada gravação (executemany + commit)")
+    ap.add_argument("--db-flush-sec", type=float, default=2.0, help="Intervalo máximo entre gravações no banco durante a análise")
+    ap.add_argument("--motion-max-skip", type=int, default=0, help="Força a inferência após N keyframes seguidos sem movimento (0 = sem limite)")
+    ap.add_argument("--backend", choices=BACKENDS, default="auto", help="Runtime do modelo em CPU (auto = o mais rápido instalado; exporta uma vez ao lado dos pesos)")
+    ap.add_argument("--int8", action="store_true", help="Quantiza o modelo exportado para INT8 (onnx/openvino)")
+    ap.add_argument("--det-cache", default=None, help="Diretório do cache de detecções (grava na primeira análise, reaproveita nas seguintes)")
+    ap.add_argument("--det-cache-mode", choices=CACHE_MODES, default="auto", help="auto: replay se houver cache, senão grava; record: sempre roda o modelo e regrava; replay: exige o cache")
+    ap.add_argument("--profile-out", default=None, help="Arquivo JSON para o relatório de desempenho da execução")
+    ap.add_argument("--profile-memory", action="store_true", help="Inclui no relatório os maiores alocadores (tracemalloc; deixa a análise mais lenta)")
+    ap.add_argument("--events", choices=("text", "jsonl"), default="text", help="Saída dos registros: texto legível ou um JSON por linha (para a API)")
+    return ap
+
+class RowCollector:
+    """Destino das linhas de pessoas finalizadas; acumula tudo para uma gravação em lote no fim"""
+    def __init__(self):
+        self.events, self.objects, self.paths, self.sessions = [], [], [], []
+
+    def add(self, events, objects, paths, sessions):
+        self.events += events
+        self.objects += objects
+        self.paths += paths
+        self.sessions += sessions
+
+    def rows(self):
+        return self.events, self.objects, self.paths, self.sessions
+
+def load_rois(args, video_key):
+    """ROIs do vídeo no rois.json: (rois, índices das áreas de carrinho, índices das áreas de caixa)"""
     with open(args.rois, "r", encoding="utf-8") as f:
         all_rois = json.load(f)
-    video_key = os.path.basename(args.video)
     if video_key not in all_rois or not all_rois[video_key]:
         raise ValueError(f"Sem ROIs para {video_key} em {args.rois}")
 
@@ -194,472 +237,692 @@ def main():
     cart_areas = []
     checkout_areas = []
     
-    # Definir áreas do carrinho (podem ser configuradas por vídeo)
-    default_cart_areas = [
-        {'center': (100, 400), 'radius': 80},  # Área do carrinho 1
-        {'center': (200, 450), 'radius': 80},  # Área do carrinho 2
-    ]
-    
     for roi in all_rois[video_key]:
         pts = clean_poly(roi["points"])
         if len(pts) >= 3:
             roi_data = {"name": roi["name"], "poly": pts}
             rois.append(roi_data)
             
-            # Separar áreas especiais
+            # Separar áreas especiais (índices na lista de ROIs)
             if args.cart_area.lower() in roi["name"].lower():
-                cart_areas.append(pts)
+                cart_areas.append(len(rois) - 1)
             elif args.checkout_area.lower() in roi["name"].lower():
-                checkout_areas.append(pts)
+                checkout_areas.append(len(rois) - 1)
 
     print(f"[INFO] {video_key} -> ROIs: {[r['name'] for r in rois]}")
     print(f"[INFO] Áreas de carrinho: {len(cart_areas)}, Áreas de caixa: {len(checkout_areas)}")
+    return rois, cart_areas, checkout_areas
+
+def open_sink(args, persist):
+    """Destino das linhas finalizadas: com persist, direto para o banco em segundo plano
+    (gravação sobreposta à inferência); senão, acumuladas no resumo"""
+    if persist:
+        print("[INFO] Gravando no Oracle Database durante a análise...")
+        try:
+            init_db()  # garante schema/tabelas
+            return StreamingWriter(batch_rows=args.db_batch_rows, flush_sec=args.db_flush_sec)
+        except Exception as e:
+            print(f"[ERRO] Falha ao preparar o banco: {e}")
+            print("[INFO] Dados serão processados mas não salvos no banco.")
+    return RowCollector()
+
+def close_sink(sink):
+    """Grava o que ainda estiver na fila do StreamingWriter e mostra o total gravado"""
+    sink.close()
+    counts = sink.counts
+    if sink.rows_failed:
+        print(f"[ERRO] {sink.rows_failed} linhas não foram salvas no banco")
+    else:
+        print(f"[OK] Dados salvos com sucesso! ({sink.commits} commits durante a análise)")
+    print(f"[INFO] Total: {counts['events']} eventos, {counts['paths']} posições, {counts['sessions']} sessões")
+
+class CameraAnalyzer:
+    """Motor de regras de uma câmera: estado das pessoas, eventos e finalização dos tracks.
+
+    Recebe os frames já com detecções (ids, xyxys, kp_xy) e não conhece a origem do vídeo
+    nem o modelo, então várias câmeras podem compartilhar o mesmo YOLO (multi_camera.py).
+    """
+    def __init__(self, args, camera_id, rois, cart_areas, checkout_areas, clock, stride, sink, lost_frames=0):
+        self.args = args
+        self.camera_id = camera_id
+        self.rois = rois
+        self.cart_areas = cart_areas
+        self.checkout_areas = checkout_areas
+        self.clock = clock
+        self.sink = sink
+        # Limiares em frames reescalados para frames analisados
+        self.reach_frames = scale_frames(args.reach_frames, stride)
+        self.entry_frames = scale_frames(10, stride)     # confirmação de entrada na loja
+        self.min_hist_frames = scale_frames(10, stride)  # filtro de detecções falsas nas estatísticas
+        self.min_valid_frames = scale_frames(30, stride) # filtro de detecções falsas na gravação
+        self.object_buffer = scale_frames(10, stride)    # buffer de estabilização de objeto
+        if stride > 1:
+            print(f"[INFO] Stride {stride}: análise a {clock.fps / stride:.1f} fps, reach={self.reach_frames} frames, buffer={self.object_buffer} frames")
+        self.persons = {}
+        self.path_cfg = TrajectoryConfig(args.path_mode, args.path_eps, args.path_min_dist, args.path_max_gap, args.path_every)
+        # Linhas em colunas com strings internadas; com --record-parquet ficam retidas para exportação
+        self.recorder = ColumnarRecorder(camera_id, keep=bool(args.record_parquet))
+        self.stats = {"customers": 0, "events": 0, "valid_ids": [], "evicted": 0}
+        # Centros das ROIs para as regras de pose, calculados uma vez
+        self.pose_rules = PoseRules(rois)
+        # Índice raster das ROIs, construído no primeiro frame (depende do tamanho do frame)
+        self.roi_index = None
+        self.cart_mask = 0
+        self.last_evict_check = clock.start_epoch
+        # Frames analisados durante os quais o ByteTrack ainda pode devolver um id perdido
+        self.lost_frames = lost_frames
+        self.frames_seen = 0
+
+    def finalize(self, pid):
+        """Tira a pessoa da memória; se for válida, entrega as linhas dela ao destino"""
+        person = self.persons.pop(pid)
+        # Filtro de detecções falsas das estatísticas (10 frames, reescalado)
+        if person.frame_count >= self.min_hist_frames:
+            self.stats["customers"] += 1
+            self.stats["events"] += len(person.rows)
+            self.stats["valid_ids"].append(pid)
+        # Filtrar pessoas que foram detectadas por muito pouco tempo
+        if person.frame_count < self.min_valid_frames:  # Menos de 30 frames (reescalado) = detecção falsa
+            print(f"[INFO] Ignorando {pid} - detectado por apenas {person.frame_count} frames")
+            return
+        print(f"[INFO] Preparando dados de {pid} - detectado por {person.frame_count} frames")
+        self.recorder.add_person(pid, person)
+        self.sink.add(*self.recorder.drain())
+
+    def evict_after(self, ts):
+        """--evict-after, nunca abaixo do tempo em que o ByteTrack mantém um track perdido: antes
+        disso o id pode voltar e viraria uma segunda pessoa (entrada e sessão duplicadas). O tempo
+        vem da taxa de análise medida, que ao vivo fica abaixo do FPS da câmera"""
+        elapsed = ts - self.clock.start_epoch
+        if not self.lost_frames or elapsed <= 0:
+            return self.args.evict_after
+        rate = self.frames_seen / elapsed
+        return max(self.args.evict_after, 2.0 * self.lost_frames / rate)
+
+    def process(self, frame_idx, pos_msec, frame, det):
+        """Aplica as regras a um frame e devolve (ts, operações de desenho)"""
+        args, camera_id, clock = self.args, self.camera_id, self.clock
+        rois, cart_areas, checkout_areas = self.rois, self.cart_areas, self.checkout_areas
+        persons, stats, pose_rules, path_cfg = self.persons, self.stats, self.pose_rules, self.path_cfg
+        reach_frames, entry_frames, object_buffer = self.reach_frames, self.entry_frames, self.object_buffer
+
+        ids, xyxys, kp_xy = det
+        ts = clock.ts(frame_idx, pos_msec)
+        self.frames_seen += 1
+        # Operações de desenho do frame (aplicadas só na janela ou no vídeo anotado)
+        overlay = []
+        if self.roi_index is None:
+            self.roi_index = RoiIndex(rois, frame.shape)
+            self.cart_mask = self.roi_index.mask_of(cart_areas)
+        roi_index, cart_mask = self.roi_index, self.cart_mask
+        # Pertinência às ROIs de todas as pessoas do frame em uma única consulta
+        centers = (xyxys[:, :2] + xyxys[:, 2:4]) / 2.0
+        roi_bits = roi_index.lookup(centers)
+        # Olhar (pessoas × ROIs) e estado das mãos de todas as pessoas de uma vez
+        frame_rules = pose_rules.evaluate(kp_xy, len(ids))
+
+        # Finaliza tracks não vistos há mais de --evict-after segundos (verificado 1x por segundo de vídeo)
+        if ts - self.last_evict_check >= 1.0:
+            self.last_evict_check = ts
+            evict_after = self.evict_after(ts)
+            for pid in [pid for pid, p in persons.items() if ts - p.last_ts > evict_after]:
+                self.finalize(pid)
+                stats["evicted"] += 1
+
+        for i, tid in enumerate(ids):
+            pid = f"{camera_id}_{tid}"
+            st = persons.get(pid)
+            if st is None:
+                st = PersonState(pid, buffer_size=object_buffer, path_cfg=path_cfg, rows=self.recorder.person_rows())
+                persons[pid] = st
+                assign_customer_tag(st)  # Atribuir TAG colorida
+                emit("person", f"[INFO] Nova pessoa detectada: {pid} - TAG atribuída", camera=camera_id, pid=pid)
+            
+            st.frame_count += 1
+            st.last_ts = ts
+            if st.first_ts is None: st.first_ts = ts
+            
+            # Só registrar eventos após a pessoa ser detectada por pelo menos 10 frames (reescalado pelo stride)
+            if st.frame_count == entry_frames:
+                st.add_event(ts, 'entrar_loja', None, None)
+                emit("event", f"[EVENT] {pid} entrou na loja (confirmado após {st.frame_count} frames)", camera=camera_id, pid=pid, event="entrar_loja", roi=None)
+            
+            # Sessão corrente (só a última é gravada)
+            st.session_ts = ts
 
-    # Modelo
-    model = YOLO("yolov8n-pose.pt")
-    cap = cv2.VideoCapture(args.video)
+            c = box_center(xyxys[i])
+            bits = roi_bits[i]
+            in_roi = roi_index.first(bits)
+            
+            # Coletar posição para salvar depois
+            st.add_path(ts, c, in_roi)
 
-    persons = {}
-    WIN = "MVP Store AI (Oracle)"
-    cv2.namedWindow(WIN, cv2.WINDOW_NORMAL)
-    
-    print("[INFO] Processando vídeo...")
-
-    while True:
-        ok, frame = cap.read()
-        if not ok: break
-        ts = time.time()
-
-        # desenha ROIs
-        for r in rois:
-            cv2.polylines(frame, [r["poly"]], True, (0,255,255), 2)
-            cx, cy = int(np.mean(r["poly"][:,0])), int(np.mean(r["poly"][:,1]))
-            cv2.putText(frame, r["name"], (cx, cy), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,0,0), 3, cv2.LINE_AA)
-            cv2.putText(frame, r["name"], (cx, cy), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,255,255), 2)
-
-        results = model.track(source=frame, stream=True, persist=True, verbose=False, 
-                             tracker="bytetrack.yaml", conf=0.3, iou=0.5)
-        for r in results:
-            boxes = r.boxes
-            kps = r.keypoints
-            if boxes is None or boxes.id is None:
-                cv2.imshow(WIN, frame)
-                if cv2.waitKey(1) == 27: break
-                continue
-
-            ids = boxes.id.int().cpu().tolist()
-            xyxys = boxes.xyxy.cpu().numpy()
-            kp_xy = kps.xy.cpu().numpy() if kps is not None else None
-
-            for i, tid in enumerate(ids):
-                pid = f"{args.camera_id}_{tid}"
-                st = persons.get(pid)
-                if st is None:
-                    st = PersonState(pid)
-                    persons[pid] = st
-                    assign_customer_tag(st)  # Atribuir TAG colorida
-                    print(f"[INFO] Nova pessoa detectada: {pid} - TAG atribuída")
-                
-                st.frame_count += 1
-                st.last_ts = ts
-                if st.first_ts is None: st.first_ts = ts
-                
-                # Só registrar eventos após a pessoa ser detectada por pelo menos 10 frames
-                if st.frame_count == 10:
-                    st.events.append({
-                        'ts': ts, 'person_id': pid, 'camera_id': args.camera_id,
-                        'event_type': 'entrar_loja', 'roi_id': None, 'conf': None, 'extra': None
-                    })
-                    print(f"[EVENT] {pid} entrou na loja (confirmado após {st.frame_count} frames)")
-                
-                # Coletar sessão para salvar depois
-                st.sessions.append({
-                    'ts': ts, 'person_id': pid, 'camera_id': args.camera_id
-                })
-
-                c = box_center(xyxys[i])
-                st.center_hist.append(c)  # Atualizar histórico de centro para estatísticas
-                in_roi = None
-                for rr in rois:
-                    if point_in_poly(c, rr["poly"]):
-                        in_roi = rr["name"]; break
+            # Detecção de olhar melhorada para prateleiras com tempo mínimo de 4 segundos
+            currently_gazing_rois = []
+            
+            for k in np.flatnonzero(frame_rules.gaze[i]):
+                roi_name = rois[k]["name"]
+                currently_gazing_rois.append(roi_name)
                 
-                # Coletar posição para salvar depois
-                st.paths.append({
-                    'ts': ts, 'person_id': pid, 'x': c[0], 'y': c[1], 
-                    'roi_id': in_roi, 'camera_id': args.camera_id
-                })
-
-                # Detecção de olhar melhorada para prateleiras com tempo mínimo de 4 segundos
-                keypoints = kp_xy[i] if kp_xy is not None else None
-                currently_gazing_rois = []
+                # Iniciar contagem de tempo se ainda não começou
+                if roi_name not in st.gaze_start_time:
+                    st.gaze_start_time[roi_name] = ts
+                    st.gaze_confirmed[roi_name] = False
                 
-                for rr in rois:
-                    roi_center = (int(np.mean(rr["poly"][:,0])), int(np.mean(rr["poly"][:,1])))
-                    is_gazing = detect_gaze_direction(keypoints, roi_center)
-                    
-                    if is_gazing:
-                        currently_gazing_rois.append(rr["name"])
-                        roi_name = rr["name"]
-                        
-                        # Iniciar contagem de tempo se ainda não começou
-                        if roi_name not in st.gaze_start_time:
-                            st.gaze_start_time[roi_name] = ts
-                            st.gaze_confirmed[roi_name] = False
-                        
-                        # Verificar se já passou o tempo mínimo (4 segundos)
-                        gaze_duration = ts - st.gaze_start_time[roi_name]
-                        if gaze_duration >= st.min_gaze_time and not st.gaze_confirmed[roi_name]:
-                            # Confirmar o olhar após 4 segundos
-                            st.gaze_confirmed[roi_name] = True
-                            gaze_key = f"olhar_prateleira_{roi_name}"
-                            if gaze_key not in st.fired:
-                                st.fired.add(gaze_key)
-                                # Debounce para logs de GAZE
-                                gaze_log_key = f"gaze_{roi_name}"
-                                if gaze_log_key not in st.last_gaze_log or (ts - st.last_gaze_log[gaze_log_key]) > st.log_cooldown:
-                                    print(f"[GAZE] {pid} está olhando para {roi_name} (4+ segundos)")
-                                    st.last_gaze_log[gaze_log_key] = ts
-                                # Evento de baixa propensão por olhar prolongado
-                                st.events.append({
-                                    'ts': ts, 'person_id': pid, 'camera_id': args.camera_id,
-                                    'event_type': 'permanencia_baixa', 'roi_id': roi_name, 'conf': 0.7,
-                                    'extra': {"gaze_s": round(gaze_duration,2), "method": "gaze_detection"}
-                                })
-                                print(f"[EVENT] {pid} olhou {gaze_duration:.1f}s para {roi_name} (LOW - GAZE)")
-                                cv2.putText(frame, f"GAZE LOW {pid}@{roi_name}", (int(c[0]), int(c[1]-40)),
-                                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,200,0), 2)
+                # Verificar se já passou o tempo mínimo (4 segundos)
+                gaze_duration = ts - st.gaze_start_time[roi_name]
+                if gaze_duration >= st.min_gaze_time and not st.gaze_confirmed[roi_name]:
+                    # Confirmar o olhar após 4 segundos
+                    st.gaze_confirmed[roi_name] = True
+                    gaze_key = f"olhar_prateleira_{roi_name}"
+                    if gaze_key not in st.fired:
+                        st.fired.add(gaze_key)
+                        # Debounce para logs de GAZE
+                        gaze_log_key = f"gaze_{roi_name}"
+                        if gaze_log_key not in st.last_gaze_log or (ts - st.last_gaze_log[gaze_log_key]) > st.log_cooldown:
+                            emit("log", f"[GAZE] {pid} está olhando para {roi_name} (4+ segundos)", level="gaze")
+                            st.last_gaze_log[gaze_log_key] = ts
+                        # Evento de baixa propensão por olhar prolongado
+                        st.add_event(ts, 'permanencia_baixa', roi_name, 0.7, {"gaze_s": round(gaze_duration,2), "method": "gaze_detection"})
+                        emit("event", f"[EVENT] {pid} olhou {gaze_duration:.1f}s para {roi_name} (LOW - GAZE)", camera=camera_id, pid=pid, event="permanencia_baixa", roi=roi_name)
+                        overlay.append(("text", f"GAZE LOW {pid}@{roi_name}", (int(c[0]), int(c[1]-40)), 0.5, (0,200,0), 2))
+        
+            # Reset gaze para ROIs que não estão sendo olhadas
+            for roi_name in list(st.gaze_start_time.keys()):
+                if roi_name not in currently_gazing_rois:
+                    del st.gaze_start_time[roi_name]
+                    if roi_name in st.gaze_confirmed:
+                        del st.gaze_confirmed[roi_name]
+
+            # Regra 1 - Dwell (permanência física na ROI)
+            if in_roi:
+                if in_roi not in st.roi_enter_ts:
+                    st.roi_enter_ts[in_roi] = ts
+                dwell = ts - st.roi_enter_ts[in_roi]
+                key = f"permanencia_baixa_{in_roi}"
+                if dwell >= args.dwell_sec and key not in st.fired:
+                    st.fired.add(key)
+                    # Coletar evento para salvar depois
+                    st.add_event(ts, 'permanencia_baixa', in_roi, 0.6, {"dwell_s": round(dwell,2), "method": "physical_presence"})
+                    emit("event", f"[EVENT] {pid} ficou {dwell:.1f}s em {in_roi} (LOW - DWELL)", camera=camera_id, pid=pid, event="permanencia_baixa", roi=in_roi)
+                    overlay.append(("text", f"DWELL LOW {pid}@{in_roi}", (int(c[0]), int(c[1]-20)), 0.5, (0,255,0), 2))
+            else:
+                st.roi_enter_ts = {}
+
+            # Detecção de objeto na mão para média propensão com buffer de estabilização
+            # (a ROI associada é a primeira do rois.json, como antes)
+            has_object = bool(frame_rules.holding[i]) and bool(rois)
+            object_roi = rois[0]["name"] if has_object else None
+            
+            # Adicionar detecção atual ao buffer
+            st.add_object_detection(has_object, object_roi)
+            
+            # Determinar estado estável baseado no buffer
+            if len(st.object_detection_buffer) >= st.buffer_size:
+                # Contar detecções positivas no buffer
+                positive_detections = st.object_positive
+                threshold = st.buffer_size * 0.8  # 80% dos frames devem detectar objeto
                 
-                # Reset gaze para ROIs que não estão sendo olhadas
-                for roi_name in list(st.gaze_start_time.keys()):
-                    if roi_name not in currently_gazing_rois:
-                        del st.gaze_start_time[roi_name]
-                        if roi_name in st.gaze_confirmed:
-                            del st.gaze_confirmed[roi_name]
-
-                # Regra 1 - Dwell (permanência física na ROI)
-                if in_roi:
-                    if in_roi not in st.roi_enter_ts:
-                        st.roi_enter_ts[in_roi] = ts
-                    dwell = ts - st.roi_enter_ts[in_roi]
-                    key = f"permanencia_baixa_{in_roi}"
-                    if dwell >= args.dwell_sec and key not in st.fired:
-                        st.fired.add(key)
-                        # Coletar evento para salvar depois
-                        st.events.append({
-                            'ts': ts, 'person_id': pid, 'camera_id': args.camera_id,
-                            'event_type': 'permanencia_baixa', 'roi_id': in_roi, 'conf': 0.6,
-                            'extra': {"dwell_s": round(dwell,2), "method": "physical_presence"}
-                        })
-                        print(f"[EVENT] {pid} ficou {dwell:.1f}s em {in_roi} (LOW - DWELL)")
-                        cv2.putText(frame, f"DWELL LOW {pid}@{in_roi}", (int(c[0]), int(c[1]-20)),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,255,0), 2)
-                else:
-                    st.roi_enter_ts = {}
-
-                # Detecção de objeto na mão para média propensão com buffer de estabilização
-                roi_dict = {r["name"]: r["poly"] for r in rois}
-                has_object, object_roi = detect_object_in_hands(keypoints, roi_dict)
+                current_stable_state = positive_detections >= threshold
+                current_stable_roi = None
                 
-                # Adicionar detecção atual ao buffer
-                st.object_detection_buffer.append((has_object, object_roi))
-                if len(st.object_detection_buffer) > st.buffer_size:
-                    st.object_detection_buffer.pop(0)
+                if current_stable_state:
+                    # Encontrar ROI mais comum no buffer
+                    roi_counts = {}
+                    for detection, roi in st.object_detection_buffer:
+                        if detection and roi:
+                            roi_counts[roi] = roi_counts.get(roi, 0) + 1
+                    if roi_counts:
+                        current_stable_roi = max(roi_counts, key=roi_counts.get)
                 
-                # Determinar estado estável baseado no buffer
-                if len(st.object_detection_buffer) >= st.buffer_size:
-                    # Contar detecções positivas no buffer
-                    positive_detections = sum(1 for detection, _ in st.object_detection_buffer if detection)
-                    threshold = st.buffer_size * 0.8  # 80% dos frames devem detectar objeto
-                    
-                    current_stable_state = positive_detections >= threshold
-                    current_stable_roi = None
-                    
-                    if current_stable_state:
-                        # Encontrar ROI mais comum no buffer
-                        roi_counts = {}
-                        for detection, roi in st.object_detection_buffer:
-                            if detection and roi:
-                                roi_counts[roi] = roi_counts.get(roi, 0) + 1
-                        if roi_counts:
-                            current_stable_roi = max(roi_counts, key=roi_counts.get)
-                    
-                    # Verificar mudança de estado estável (com cooldown)
-                    if (current_stable_state != st.stable_object_state or current_stable_roi != st.stable_object_roi) and (ts - st.last_state_change) > st.state_change_cooldown:
-                        if current_stable_state and current_stable_roi:
-                            # Começou a segurar objeto (estado estável)
-                            if not st.holding_object:
-                                # Criar ID único para esta interação
-                                interaction_id = f"{current_stable_roi}_{int(ts)}"
-                                st.current_interaction_id = interaction_id
-                                
-                                st.holding_object = True
-                                st.object_picked_from = current_stable_roi
-                                st.object_pick_ts = ts
-                                
-                                # Verificar se já foi registrado evento de pegar para esta ROI
-                                if current_stable_roi not in st.fired_pick:
-                                    st.fired_pick[current_stable_roi] = True
-                                    print(f"[OBJECT] {pid} pegou objeto de {current_stable_roi}")
-                                    
-                                    # Log do evento de pegar objeto
-                                    st.customer_objects.append({
-                                        'ts': ts, 'person_id': pid, 'camera_id': args.camera_id,
-                                        'object_type': 'produto', 'roi_id': current_stable_roi, 'action': 'pegar', 'confidence': 0.8
-                                    })
-                    
-                        elif not current_stable_state:
-                            # Parou de segurar objeto (estado estável)
-                            if st.holding_object and st.object_picked_from:
-                                # Verificar se já foi registrado evento de soltar para esta ROI
-                                if st.object_picked_from not in st.fired_drop:
-                                    st.fired_drop[st.object_picked_from] = True
-                                    print(f"[OBJECT] {pid} soltou objeto de {st.object_picked_from}")
-                                    
-                                    # Log do evento de colocar objeto
-                                    st.customer_objects.append({
-                                        'ts': ts, 'person_id': pid, 'camera_id': args.camera_id,
-                                        'object_type': 'produto', 'roi_id': st.object_picked_from, 'action': 'colocar', 'confidence': 0.7
-                                    })
-                                
-                                # Reset dos estados
-                                st.holding_object = False
-                                st.object_picked_from = None
-                                st.object_pick_ts = None
-                                st.current_interaction_id = None
+                # Verificar mudança de estado estável (com cooldown)
+                if (current_stable_state != st.stable_object_state or current_stable_roi != st.stable_object_roi) and (ts - st.last_state_change) > st.state_change_cooldown:
+                    if current_stable_state and current_stable_roi:
+                        # Começou a segurar objeto (estado estável)
+                        if not st.holding_object:
+                            # Criar ID único para esta interação
+                            interaction_id = f"{current_stable_roi}_{int(ts)}"
+                            st.current_interaction_id = interaction_id
+                            
+                            st.holding_object = True
+                            st.object_picked_from = current_stable_roi
+                            st.object_pick_ts = ts
+                            
+                            # Verificar se já foi registrado evento de pegar para esta ROI
+                            if current_stable_roi not in st.fired_pick:
+                                st.fired_pick[current_stable_roi] = True
+                                emit("object", f"[OBJECT] {pid} pegou objeto de {current_stable_roi}", camera=camera_id, pid=pid, action="pegar", roi=current_stable_roi)
                                 
-                                # Reset dos controles de fired para permitir nova interação
-                                st.fired_pick = {}
-                                st.fired_drop = {}
-                                st.fired_hold = {}
-                        
-                        # Atualizar estado estável
-                        st.stable_object_state = current_stable_state
-                        st.stable_object_roi = current_stable_roi
-                        st.last_state_change = ts
+                                # Log do evento de pegar objeto
+                                st.add_object(ts, 'produto', current_stable_roi, 'pegar', 0.8)
                 
-                # Verificar se está segurando por tempo suficiente (usando estado estável)
-                if st.holding_object and st.object_pick_ts and (ts - st.object_pick_ts) >= (args.hold_frames / 30.0):
-                    if st.object_picked_from and not st.fired_hold.get(st.object_picked_from, False):
-                        print(f"[EVENT] {pid} segurando objeto de {st.object_picked_from} (MED - HOLD)")
-                        st.fired_hold[st.object_picked_from] = True
-                        # Log do evento de segurar objeto
-                        st.customer_objects.append({
-                            'ts': ts, 'person_id': pid, 'camera_id': args.camera_id,
-                            'object_type': 'produto', 'roi_id': st.object_picked_from, 'action': 'segurar', 'confidence': 0.8
-                        })
-
-                # Regra 2 - Reach (alcance físico da ROI)
-                for rr in rois:
-                    if point_in_poly(c, rr["poly"]):
-                        st.reach_frames[rr["name"]] = st.reach_frames.get(rr["name"], 0) + 1
-                        if st.reach_frames[rr["name"]] >= args.reach_frames:
-                            key = f"reach_{rr['name']}"
-                            if key not in st.fired:
-                                st.fired.add(key)
-                                st.post_reach_ref[rr["name"]] = {"ts": ts, "center": c}
-                                # Coletar evento para salvar depois
-                                st.events.append({
-                                    'ts': ts, 'person_id': pid, 'camera_id': args.camera_id,
-                                    'event_type': 'alcance_medio', 'roi_id': rr["name"], 'conf': 0.75,
-                                    'extra': {"method": "physical_reach"}
-                                })
-                                print(f"[EVENT] {pid} alcançou {rr['name']} (MED - REACH)")
-                                cv2.putText(frame, f"REACH MED {pid}@{rr['name']}", (int(c[0]), int(c[1]-40)),
-                                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,165,255), 2)
-                    else:
-                        st.reach_frames[rr["name"]] = max(0, st.reach_frames.get(rr["name"], 0) - 1)
-
-                # Detecção de colocação no carrinho para alta propensão
-                if st.holding_object and cart_areas:
-                    cart_interaction = detect_cart_interaction(keypoints, c, cart_areas)
-                    if cart_interaction:
-                        cart_key = f"colocar_carrinho_{st.object_picked_from}"
-                        if cart_key not in st.fired:
-                            st.fired.add(cart_key)
-                            # Evento de alta propensão por colocar no carrinho
-                            st.events.append({
-                                'ts': ts, 'person_id': pid, 'camera_id': args.camera_id,
-                                'event_type': 'colocar_carrinho_alta', 'roi_id': st.object_picked_from, 'conf': 0.9,
-                                'extra': {"method": "cart_placement"}
-                            })
-                            print(f"[EVENT] {pid} colocou item de {st.object_picked_from} no carrinho (HIGH)")
-                            cv2.putText(frame, f"CART HIGH {pid}", (int(c[0]), int(c[1]-80)),
-                                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,0,255), 2)
-                            
-                            # Log do evento de colocar no carrinho
-                            st.customer_objects.append({
-                                'ts': ts, 'person_id': pid, 'camera_id': args.camera_id,
-                                'object_type': 'produto', 'roi_id': st.object_picked_from, 'action': 'colocar_carrinho', 'confidence': 0.9
-                            })
+                    elif not current_stable_state:
+                        # Parou de segurar objeto (estado estável)
+                        if st.holding_object and st.object_picked_from:
+                            # Verificar se já foi registrado evento de soltar para esta ROI
+                            if st.object_picked_from not in st.fired_drop:
+                                st.fired_drop[st.object_picked_from] = True
+                                emit("object", f"[OBJECT] {pid} soltou objeto de {st.object_picked_from}", camera=camera_id, pid=pid, action="soltar", roi=st.object_picked_from)
+                                
+                                # Log do evento de colocar objeto
+                                st.add_object(ts, 'produto', st.object_picked_from, 'colocar', 0.7)
                             
-                            # Resetar estado do objeto
+                            # Reset dos estados
                             st.holding_object = False
                             st.object_picked_from = None
                             st.object_pick_ts = None
-
-                # Sistema de validação no checkout
-                if checkout_areas:
-                    for checkout in checkout_areas:
-                        if point_in_poly(c, checkout["poly"]):
-                            checkout_key = f"checkout_{checkout['name']}"
-                            if checkout_key not in st.fired:
-                                st.fired.add(checkout_key)
-                                
-                                # Calcular propensão total do cliente
-                                propensao_score = 0
-                                propensao_eventos = []
-                                
-                                # Verificar eventos de baixa propensão (olhar para prateleira)
-                                baixa_eventos = [e for e in st.events if e['event_type'] == 'permanencia_baixa' and e.get('extra', {}).get('method') == 'gaze_detection']
-                                if baixa_eventos:
-                                    propensao_score += 1
-                                    propensao_eventos.append('olhar_prateleira')
-                                
-                                # Verificar eventos de média propensão (segurar objeto)
-                                media_eventos = [e for e in st.events if e['event_type'] == 'alcance_medio' and e.get('extra', {}).get('method') == 'object_holding']
-                                if media_eventos:
-                                    propensao_score += 2
-                                    propensao_eventos.append('segurar_objeto')
-                                
-                                # Verificar eventos de alta propensão (colocar no carrinho)
-                                alta_eventos = [e for e in st.events if e['event_type'] == 'colocar_carrinho_alta']
-                                if alta_eventos:
-                                    propensao_score += 3
-                                    propensao_eventos.append('colocar_carrinho')
-                                
-                                # Classificar propensão final
-                                if propensao_score >= 5:
-                                    propensao_final = 'ALTA'
-                                elif propensao_score >= 3:
-                                    propensao_final = 'MEDIA'
-                                elif propensao_score >= 1:
-                                    propensao_final = 'BAIXA'
-                                else:
-                                    propensao_final = 'NENHUMA'
-                                
-                                # Log da validação no checkout
-                                st.purchase_validations.append({
-                                    'ts': ts, 'person_id': pid, 'camera_id': args.camera_id,
-                                    'checkout_id': checkout['name'], 'predicted_propensity': propensao_final,
-                                    'propensity_score': propensao_score, 'events_detected': ','.join(propensao_eventos),
-                                    'actual_purchase': None  # Será preenchido posteriormente
-                                })
-                                
-                                print(f"[CHECKOUT] {pid} no checkout {checkout['name']} - Propensão: {propensao_final} (Score: {propensao_score})")
-                                cv2.putText(frame, f"CHECKOUT {propensao_final} {pid}", (int(c[0]), int(c[1]-100)),
-                                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255,255,0), 2)
-
-                # Regra 3 - Depart
-                for name, ref in list(st.post_reach_ref.items()):
-                    if ts - ref["ts"] <= args.depart_window:
-                        if euclid(c, ref["center"]) >= args.depart_px and f"sair_alta_{name}" not in st.fired:
-                            st.fired.add(f"sair_alta_{name}")
+                            st.current_interaction_id = None
+                            
+                            # Reset dos controles de fired para permitir nova interação
+                            st.fired_pick = {}
+                            st.fired_drop = {}
+                            st.fired_hold = {}
+                    
+                    # Atualizar estado estável
+                    st.stable_object_state = current_stable_state
+                    st.stable_object_roi = current_stable_roi
+                    st.last_state_change = ts
+            
+            # Verificar se está segurando por tempo suficiente (usando estado estável)
+            if st.holding_object and st.object_pick_ts and (ts - st.object_pick_ts) >= (args.hold_frames / clock.fps):
+                if st.object_picked_from and not st.fired_hold.get(st.object_picked_from, False):
+                    emit("object", f"[EVENT] {pid} segurando objeto de {st.object_picked_from} (MED - HOLD)", camera=camera_id, pid=pid, action="segurar", roi=st.object_picked_from)
+                    st.fired_hold[st.object_picked_from] = True
+                    # Log do evento de segurar objeto
+                    st.add_object(ts, 'produto', st.object_picked_from, 'segurar', 0.8)
+
+            # Regra 2 - Reach (alcance físico da ROI)
+            for k, rr in enumerate(rois):
+                if RoiIndex.contains(bits, k):
+                    st.reach_frames[rr["name"]] = st.reach_frames.get(rr["name"], 0) + 1
+                    if st.reach_frames[rr["name"]] >= reach_frames:
+                        key = f"reach_{rr['name']}"
+                        if key not in st.fired:
+                            st.fired.add(key)
+                            st.post_reach_ref[rr["name"]] = {"ts": ts, "center": c}
                             # Coletar evento para salvar depois
-                            st.events.append({
-                                'ts': ts, 'person_id': pid, 'camera_id': args.camera_id,
-                                'event_type': 'sair_alta', 'roi_id': name, 'conf': 0.85,
-                                'extra': {"method": "depart_after_reach"}
+                            st.add_event(ts, 'alcance_medio', rr["name"], 0.75, {"method": "physical_reach"})
+                            emit("event", f"[EVENT] {pid} alcançou {rr['name']} (MED - REACH)", camera=camera_id, pid=pid, event="alcance_medio", roi=rr["name"])
+                            overlay.append(("text", f"REACH MED {pid}@{rr['name']}", (int(c[0]), int(c[1]-40)), 0.5, (0,165,255), 2))
+                else:
+                    st.reach_frames[rr["name"]] = max(0, st.reach_frames.get(rr["name"], 0) - 1)
+
+            # Detecção de colocação no carrinho para alta propensão
+            if st.holding_object and cart_areas:
+                cart_interaction = bool(bits & cart_mask) and bool(frame_rules.cart_pose[i])
+                if cart_interaction:
+                    cart_key = f"colocar_carrinho_{st.object_picked_from}"
+                    if cart_key not in st.fired:
+                        st.fired.add(cart_key)
+                        # Evento de alta propensão por colocar no carrinho
+                        st.add_event(ts, 'colocar_carrinho_alta', st.object_picked_from, 0.9, {"method": "cart_placement"})
+                        emit("event", f"[EVENT] {pid} colocou item de {st.object_picked_from} no carrinho (HIGH)", camera=camera_id, pid=pid, event="colocar_carrinho_alta", roi=st.object_picked_from)
+                        overlay.append(("text", f"CART HIGH {pid}", (int(c[0]), int(c[1]-80)), 0.6, (0,0,255), 2))
+                        
+                        # Log do evento de colocar no carrinho
+                        st.add_object(ts, 'produto', st.object_picked_from, 'colocar_carrinho', 0.9)
+                        
+                        # Resetar estado do objeto
+                        st.holding_object = False
+                        st.object_picked_from = None
+                        st.object_pick_ts = None
+
+            # Sistema de validação no checkout
+            if checkout_areas:
+                for k in checkout_areas:
+                    checkout = rois[k]
+                    if RoiIndex.contains(bits, k):
+                        checkout_key = f"checkout_{checkout['name']}"
+                        if checkout_key not in st.fired:
+                            st.fired.add(checkout_key)
+                            
+                            # Propensão total do cliente (contadores mantidos em add_event)
+                            propensao_final, propensao_score, propensao_eventos = st.propensity()
+                            
+                            # Log da validação no checkout
+                            st.purchase_validations.append({
+                                'ts': ts, 'person_id': pid, 'camera_id': camera_id,
+                                'checkout_id': checkout['name'], 'predicted_propensity': propensao_final,
+                                'propensity_score': propensao_score, 'events_detected': ','.join(propensao_eventos),
+                                'actual_purchase': None  # Será preenchido posteriormente
                             })
-                            print(f"[EVENT] {pid} saiu após alcançar {name} (HIGH)")
-                            cv2.putText(frame, f"DEPART HIGH {pid}", (int(c[0]), int(c[1]-60)),
-                                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,0,255), 2)
-                    else:
-                        st.post_reach_ref.pop(name, None)
-
-                cv2.circle(frame, (int(c[0]), int(c[1])), 4, (255,255,255), -1)
-                cv2.putText(frame, pid, (int(c[0])+6, int(c[1])+6),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.45, (220,220,220), 1)
-
-            cv2.imshow(WIN, frame)
-            if cv2.waitKey(1) == 27:
-                cap.release(); cv2.destroyAllWindows(); return
-
+                            
+                            emit("checkout", f"[CHECKOUT] {pid} no checkout {checkout['name']} - Propensão: {propensao_final} (Score: {propensao_score})",
+                                 camera=camera_id, pid=pid, checkout=checkout["name"], propensity=propensao_final, score=propensao_score)
+                            overlay.append(("text", f"CHECKOUT {propensao_final} {pid}", (int(c[0]), int(c[1]-100)), 0.6, (255,255,0), 2))
+
+            # Regra 3 - Depart
+            for name, ref in list(st.post_reach_ref.items()):
+                if ts - ref["ts"] <= args.depart_window:
+                    if euclid(c, ref["center"]) >= args.depart_px and f"sair_alta_{name}" not in st.fired:
+                        st.fired.add(f"sair_alta_{name}")
+                        # Coletar evento para salvar depois
+                        st.add_event(ts, 'sair_alta', name, 0.85, {"method": "depart_after_reach"})
+                        emit("event", f"[EVENT] {pid} saiu após alcançar {name} (HIGH)", camera=camera_id, pid=pid, event="sair_alta", roi=name)
+                        overlay.append(("text", f"DEPART HIGH {pid}", (int(c[0]), int(c[1]-60)), 0.5, (0,0,255), 2))
+                else:
+                    st.post_reach_ref.pop(name, None)
+
+            overlay.append(("circle", (int(c[0]), int(c[1])), 4, (255,255,255)))
+            if st.propensity_score != st.propensity_reported:
+                # Score corrente do track para quem consome os registros (API), não só o overlay
+                st.propensity_reported = st.propensity_score
+                level, score, signals = st.propensity()
+                emit("propensity", camera=camera_id, pid=pid, level=level, score=score, signals=signals)
+            label = pid if not st.propensity_score else f"{pid} {propensity_level(st.propensity_score)}"
+            overlay.append(("text", label, (int(c[0])+6, int(c[1])+6), 0.45, (220,220,220), 1))
+        return ts, overlay
+
+    def finish(self, parquet_dir=None):
+        """Finaliza quem ainda está em cena e devolve as estatísticas da câmera"""
+        print(f"[INFO] {self.stats['evicted']} tracks finalizados durante a análise, {len(self.persons)} no fim do vídeo")
+        for pid in list(self.persons):
+            self.finalize(pid)
+        if parquet_dir:
+            try:
+                print(f"[INFO] Linhas exportadas em Parquet: {self.recorder.to_parquet(parquet_dir)}")
+            except Exception as e:
+                print(f"[ERRO] Falha ao exportar Parquet: {e}")
+        return self.stats
+
+def print_report(report, path=None):
+    """Resumo do relatório de desempenho na saída e, com path, o JSON completo em arquivo"""
+    for name, st in report["stages"].items():
+        print(f"[STATS] STAGE {name}: p50 {st['p50_ms']:.1f}ms, p90 {st['p90_ms']:.1f}ms, p99 {st['p99_ms']:.1f}ms, "
+              f"total {st['total_s']:.1f}s ({st['count']}x)")
+    ppf = report["persons_per_frame"]
+    print(f"[STATS] PERSONS_PER_FRAME: média {ppf['mean']:.1f}, máx {ppf['max']}")
+    mem = report["memory"]
+    print(f"[STATS] PEAK_RSS_MB: {mem['peak_rss_mb']}")
+    for alloc in mem.get("top_allocators", [])[:5]:
+        print(f"[STATS] ALLOC {alloc['where']}: {alloc['size_kb']:.0f} KB em {alloc['count']} blocos")
+    if path:
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"[INFO] Relatório de desempenho salvo em {path}")
+        except OSError as e:
+            print(f"[ERRO] Falha ao salvar o relatório de desempenho: {e}")
+
+def detection_settings(args, rois, stride, model=None):
+    """Opções que mudam as detecções e, portanto, a chave do cache (limiares das regras não entram).
+    Sem model, o backend é o pedido em --backend/--int8: a chave é a mesma na busca e na gravação
+    mesmo que o carregamento caia para o PyTorch (o backend efetivo fica no meta.json)"""
+    if model is not None:
+        backend = getattr(model, "backend_name", "torch")
+    else:
+        try:
+            backend = resolve_backend(args.backend)
+        except Exception:
+            backend = "torch"
+        if args.int8 and backend != "torch":
+            backend += "-int8"
+    settings = {
+        "model": f"{POSE_WEIGHTS}:{backend}", "tracker": "bytetrack.yaml", "imgsz": args.imgsz,
+        "stride": stride, "detect_every": max(1, args.detect_every),
+        "roi_crop": args.roi_pad if args.roi_crop else None,
+        "motion_gate": [args.motion_thresh, args.motion_max_skip] if args.motion_gate else None,
+    }
+    # Com recorte ou MotionGate as ROIs influenciam o que o modelo vê
+    if args.roi_crop or args.motion_gate:
+        settings["rois"] = [r["poly"].tolist() for r in rois]
+    return settings
+
+def tracker_frame_rate(clock, stride, detect_every):
+    """Atualizações do ByteTrack por segundo de vídeo: ele só recebe os keyframes. Ao vivo a taxa
+    real é menor (frames atrasados são descartados); CameraAnalyzer.evict_after compensa"""
+    return clock.fps / (stride * max(1, detect_every))
+
+def make_pose_tracker(args, model, rois, cap, frame_rate):
+    """PoseTracker da câmera, com o recorte das ROIs (--roi-crop) quando ele reduz o frame"""
+    crop = None
+    frame_h, frame_w = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    if args.roi_crop and frame_h > 0 and frame_w > 0:
+        crop = roi_crop_box(rois, (frame_h, frame_w), args.roi_pad)
+        crop_area = (crop[2] - crop[0]) * (crop[3] - crop[1])
+        print(f"[INFO] Recorte das ROIs {crop}: {100.0 * crop_area / (frame_h * frame_w):.0f}% do frame")
+        if crop == (0, 0, frame_w, frame_h):
+            crop = None  # ROIs cobrem o frame inteiro
+    return PoseTracker(model, frame_rate=frame_rate, imgsz=args.imgsz, crop=crop)
+
+def release_io(reader, cap, writer=None, show=False):
+    """Para o leitor (thread de decodificação/captura) e libera VideoCapture, vídeo anotado e janela"""
+    if reader is not None:
+        reader.stop()
     cap.release()
-    cv2.destroyAllWindows()
-    
-    # Filter out false detections (less than 10 frames)
-    valid_people = {pid: person for pid, person in persons.items() if len(person.center_hist) >= 10}
-    total_customers = len(valid_people)
-    total_events = sum(len(person.events) for person in valid_people.values())
-    
-    print(f"[STATS] TOTAL_CUSTOMERS: {total_customers}")
-    print(f"[STATS] TOTAL_INTERACTIONS: {total_events}")
-    print(f"[STATS] VALID_DETECTIONS: {list(valid_people.keys())}")
-    
-    # Salvar todos os dados no banco de uma vez usando lote
-    print("[INFO] Salvando dados no Oracle Database...")
+    if writer is not None:
+        writer.close()
+    if show:
+        cv2.destroyAllWindows()
+
+def analyze_video(args, model=None, persist=True):
+    """Analisa um vídeo e devolve o resumo da execução (com as linhas para o banco em 'rows').
+
+    model permite reaproveitar um YOLO já carregado (ex.: workers de lote); com persist=False
+    nada é gravado no banco e quem chamou decide como salvar as linhas.
+    """
+    rois, cart_areas, checkout_areas = load_rois(args, args.roi_key or os.path.basename(args.video))
+    live = args.live or args.simulate_live
+    reader = None
+    if live:
+        # Câmera ao vivo: a captura começa já e a análise pega sempre o frame mais recente
+        reader = LiveFrameReader(args.video, simulate=args.simulate_live,
+                                 reconnect_delay=args.reconnect_delay, max_reconnects=args.max_reconnects)
+        cap = reader.cap
+    else:
+        cap = cv2.VideoCapture(args.video)
+
+    # Stride de análise (os limiares em frames são reescalados no CameraAnalyzer)
+    video_fps = cap.get(cv2.CAP_PROP_FPS)
+    stride = max(1, args.stride)
+    if args.target_fps and video_fps > 0:
+        stride = max(1, int(round(video_fps / args.target_fps)))
+    if live and stride > 1:
+        print("[INFO] Modo ao vivo: --stride/--target-fps ignorados (frames atrasados já são descartados)")
+        stride = 1
+
+    # Falha na preparação (cache, modelo, banco, tracker): encerra o que já foi aberto antes de
+    # propagar, para não deixar threads e conexões vivas (ex.: workers do AnalyzerPool)
+    sink = writer = None
+    show = not args.headless
     try:
-        init_db()  # garante schema/tabelas
-        
-        # Preparar dados em lote
-        events_data = []
-        objects_data = []
-        paths_data = []
-        sessions_data = []
-        
-        for pid, person in persons.items():
-            # Filtrar pessoas que foram detectadas por muito pouco tempo
-            if person.frame_count < 30:  # Menos de 30 frames = detecção falsa
-                print(f"[INFO] Ignorando {pid} - detectado por apenas {person.frame_count} frames")
-                continue
-                
-            print(f"[INFO] Preparando dados de {pid} - detectado por {person.frame_count} frames")
-            
-            # Preparar eventos
-            for event in person.events:
-                events_data.append({
-                    'ts': _ts(event['ts']),
-                    'pid': event['person_id'],
-                    'cam': event['camera_id'],
-                    'evt': event['event_type'],
-                    'roi': event['roi_id'],
-                    'conf': event['conf'],
-                    'extra': event['extra']
-                })
-            
-            # Preparar objetos do cliente
-            for obj in person.customer_objects:
-                objects_data.append({
-                    'ts': _ts(obj['ts']),
-                    'pid': obj['person_id'],
-                    'cam': obj['camera_id'],
-                    'obj_type': obj['object_type'],
-                    'roi': obj['roi_id'],
-                    'action': obj['action'],
-                    'conf': obj['confidence']
-                })
-            
-            # Preparar paths (amostragem para não sobrecarregar)
-            for i, path in enumerate(person.paths):
-                if i % 20 == 0:  # Reduzir ainda mais: 1 a cada 20 posições
-                    paths_data.append({
-                        'ts': _ts(path['ts']),
-                        'pid': path['person_id'],
-                        'cam': path['camera_id'],
-                        'x': path['x'],
-                        'y': path['y'],
-                        'roi': path['roi_id']
-                    })
-            
-            # Preparar sessões (apenas a última de cada pessoa)
-            if person.sessions:
-                last_session = person.sessions[-1]
-                sessions_data.append({
-                    'ts': _ts(last_session['ts']),
-                    'pid': last_session['person_id'],
-                    'cam': last_session['camera_id']
-                })
+        # Cache de detecções: no replay o modelo nem é carregado
+        cache = cache_writer = None
+        if args.det_cache and live:
+            print("[INFO] --det-cache ignorado no modo ao vivo")
+        elif args.det_cache:
+            path, settings = cache_path(args.det_cache, args.video, detection_settings(args, rois, stride, model))
+            if args.det_cache_mode != "record" and cache_exists(path):
+                cache = DetectionCache(path)
+                print(f"[INFO] Replay do cache de detecções {path} ({len(cache)} frames, backend "
+                      f"{cache.meta.get('backend', '?')}, sem modelo)")
+            elif args.det_cache_mode == "replay":
+                raise FileNotFoundError(f"Sem cache de detecções de {args.video} para estas opções em {args.det_cache}")
+
+        # Modelo
+        if model is None and cache is None:
+            model = load_pose_model(args.backend, args.int8)
+        if args.det_cache and not live and cache is None:
+            cache_writer = DetectionCacheWriter(path, {**settings, "video": args.video, "fps": video_fps,
+                                                       "backend": getattr(model, "backend_name", "torch")})
+            print(f"[INFO] Detecções serão gravadas em {path}")
+
+        sink = open_sink(args, persist)
+        WIN = "MVP Store AI (Oracle)"
+        if show:
+            cv2.namedWindow(WIN, cv2.WINDOW_NORMAL)
+        roi_layer = None
+        if args.annotated_out:
+            writer = AsyncAnnotatedWriter(args.annotated_out, video_fps / stride if video_fps > 0 else 0, rois)
         
-        # Salvar tudo em lote
-        save_analysis_data_batch(events_data, objects_data, paths_data, sessions_data)
-        
-        print(f"[OK] Dados salvos com sucesso!")
-        print(f"[INFO] Total: {len(events_data)} eventos, {len(paths_data)} posições, {len(sessions_data)} sessões")
-        
-    except Exception as e:
-        print(f"[ERRO] Falha ao salvar no banco: {e}")
-        print("[INFO] Dados processados mas não salvos no banco.")
+        print("[INFO] Processando vídeo...")
+        if live:
+            # Ao vivo o "tempo do vídeo" é o instante de captura de cada frame
+            clock = MediaClock(video_fps, reader.start_wall)
+        elif cache is not None and not show and writer is None:
+            # Replay sem saída de vídeo: nada é decodificado, só as detecções do cache
+            reader = CachedFrames(cache)
+            clock = MediaClock(video_fps, parse_start_time(args.video_start))
+        else:
+            # Decodificação em thread própria, sobreposta à inferência
+            reader = FrameReader(cap, args.prefetch, stride)
+            # Relógio de mídia: regras e data_hora usam o tempo do vídeo, não time.time()
+            clock = MediaClock(video_fps, parse_start_time(args.video_start))
+        print(f"[INFO] Relógio de mídia: {clock.fps:.2f} fps, início {_ts(clock.start_epoch).isoformat()}")
+        # Inferência em lote (--batch) só nos keyframes (--detect-every); o ByteTrack é
+        # atualizado keyframe a keyframe, em ordem, antes das regras por pessoa
+        pose_tracker = gate = None
+        if cache is not None:
+            pipeline = ReplayPipeline(reader, cache)
+            lost_frames = cache.meta.get("lost_frames", 0)
+        else:
+            pose_tracker = make_pose_tracker(args, model, rois, cap, tracker_frame_rate(clock, stride, args.detect_every))
+            gate = MotionGate(rois, min_fraction=args.motion_thresh, max_skip=args.motion_max_skip) if args.motion_gate else None
+            # Ao vivo não há lote: esperar keyframes para formar um lote só aumentaria a latência
+            pipeline = DetectionPipeline(reader, pose_tracker, 1 if live else args.batch, args.detect_every, gate)
+            lost_frames = pose_tracker.tracker.max_time_lost * pipeline.detect_every
+            if cache_writer is not None:
+                cache_writer.meta["lost_frames"] = lost_frames  # o replay avalia a expiração igual
+        camera = CameraAnalyzer(args, args.camera_id, rois, cart_areas, checkout_areas, clock, stride, sink, lost_frames)
+    except BaseException:
+        release_io(reader, cap, writer, show)
+        if isinstance(sink, StreamingWriter):
+            sink.close()
+        raise
+
+    latencies = deque(maxlen=2000)
+    last_latency_report = time.time()
+    # Tempos por etapa: decode/inferência/tracking ficam nos objetos que as executam, o loop
+    # principal mede regras, desenho e o tempo total por frame
+    prof = RunProfiler(trace_memory=args.profile_memory)
+    t_rules, t_draw, t_frame = prof.stage("rules"), prof.stage("drawing"), prof.stage("frame")
+    t_start = time.time()
+    t_prev = now()
+    # Progresso para a API (registro "progress"): no máximo 1 por segundo
+    frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    duration = frame_count / clock.fps if not live and frame_count > 0 else None
+    last_progress = t_start
+
+    # Parada antecipada (ESC, Ctrl+C, SIGTERM) também finaliza os tracks em cena e grava o que
+    # falta; em erro, o que já foi finalizado é gravado e threads/conexões são encerradas
+    stop_reason = None
+    try:
+        for frame_idx, pos_msec, frame, det in pipeline:
+            if cache_writer is not None:
+                cache_writer.add(frame_idx, pos_msec, frame.shape, det)
+            t0 = now()
+            ts, overlay = camera.process(frame_idx, pos_msec, frame, det)
+            t_rules.since(t0)
+            prof.persons[len(det[0])] += 1
+            wall = time.time()
+            if wall - last_progress >= 1.0:
+                last_progress = wall
+                emit("progress", frames=reader.frames_read, position_s=round(clock.position, 2), duration_s=duration)
+
+            if live:
+                # Latência captura -> eventos do frame (regras já avaliadas)
+                latencies.append(wall - ts)
+                if wall - last_latency_report >= 10.0:
+                    last_latency_report = wall
+                    print(f"[STATS] LATENCY: {latency_summary(latencies)}, {reader.frames_dropped} frames descartados")
+
+            if show:
+                t0 = now()
+                if roi_layer is None:
+                    roi_layer = RoiLayer(rois, frame.shape)
+                draw_overlay(roi_layer.apply(frame), overlay)
+                t_draw.since(t0)
+                if writer is not None:
+                    writer.write(frame, None)
+                cv2.imshow(WIN, frame)
+                if cv2.waitKey(1) == 27:
+                    stop_reason = "ESC"
+                    break
+            elif writer is not None:
+                writer.write(frame, overlay)
+            t_prev = t_frame.since(t_prev)
+    except KeyboardInterrupt:
+        stop_reason = "interrupção"
+    except BaseException:
+        try:
+            camera.finish()
+        finally:
+            if isinstance(sink, StreamingWriter):
+                close_sink(sink)
+        raise
+    finally:
+        release_io(reader, cap, writer, show)
+    if stop_reason:
+        print(f"[INFO] Análise interrompida ({stop_reason}); finalizando os tracks em cena")
+    elapsed = time.time() - t_start
+    if cache_writer is not None and stop_reason:
+        # Cache parcial seria reproduzido depois como se fosse o vídeo inteiro
+        print("[INFO] Análise interrompida: cache de detecções não gravado")
+    elif cache_writer is not None:
+        try:
+            cache_writer.close()
+        except Exception as e:
+            print(f"[ERRO] Falha ao gravar o cache de detecções: {e}")
+    backend = "cache" if cache is not None else getattr(model, "backend_name", "torch")
+    emit("stats", f"[STATS] BACKEND: {backend}", name="BACKEND", value=backend)
+    print(f"[STATS] BATCH_SIZE: {pipeline.batch_size}")
+    print(f"[INFO] Inferência: {pipeline.keyframes} keyframes em {pipeline.batches} lotes (detect-every {pipeline.detect_every})")
+    if gate is not None:
+        print(f"[STATS] FRAMES_GATED: {pipeline.frames_gated} de {pipeline.frames_processed} sem movimento (inferência pulada)")
+    if live:
+        print(f"[STATS] LATENCY: {latency_summary(latencies)}, {reader.frames_dropped} frames descartados, {reader.reconnects} reconexões")
+    print(f"[INFO] {reader.frames_read} frames analisados ({reader.frames_decoded} decodificados) em {elapsed:.1f}s ({reader.frames_read / max(elapsed, 1e-6):.1f} fps, "
+          f"{clock.position / max(elapsed, 1e-6):.1f}x tempo real)")
+    
+    streaming = isinstance(sink, StreamingWriter)
+    try:
+        stats = camera.finish(args.record_parquet)
+    finally:
+        if streaming:
+            close_sink(sink)
+    total_customers = stats["customers"]
+    total_events = stats["events"]
+    
+    emit("stats", f"[STATS] TOTAL_CUSTOMERS: {total_customers}", name="TOTAL_CUSTOMERS", value=total_customers)
+    emit("stats", f"[STATS] TOTAL_INTERACTIONS: {total_events}", name="TOTAL_INTERACTIONS", value=total_events)
+    emit("stats", f"[STATS] VALID_DETECTIONS: {stats['valid_ids']}", name="VALID_DETECTIONS", value=stats["valid_ids"])
+
+    summary = {
+        "video": args.video, "camera_id": args.camera_id, "backend": backend,
+        "duration_s": clock.position, "frames": reader.frames_read, "frames_gated": pipeline.frames_gated,
+        "frames_dropped": reader.frames_dropped if live else 0, "elapsed_s": elapsed,
+        "total_customers": total_customers, "total_events": total_events,
+        "rows": None if streaming else sink.rows(),
+    }
+    report = prof.report({
+        "decode": reader.decode_s, "motion_gate": pipeline.gate_s, "inference": pose_tracker.infer_s if pose_tracker else None,
+        "tracking": pose_tracker.track_s if pose_tracker else None, "propagation": pipeline.propagate_s, "rules": t_rules,
+        "drawing": t_draw, "annotated_render": writer.render_s if writer is not None else None,
+        "db_flush": sink.flush_s if streaming else None, "frame": t_frame,
+    }, video=args.video, camera_id=args.camera_id, backend=backend, frames=reader.frames_read,
+       elapsed_s=round(elapsed, 3), fps=round(reader.frames_read / max(elapsed, 1e-6), 2),
+       batch_size=pipeline.batch_size, detect_every=pipeline.detect_every, keyframes=pipeline.keyframes)
+    print_report(report, args.profile_out)
+    emit("report", report=report)
+    summary["performance"] = report
+    # Fim da análise para quem consome os registros (a API não depende mais do texto "[INFO] Total:")
+    emit("done", **{k: v for k, v in summary.items() if k not in ("rows", "performance")},
+         saved=streaming and not sink.rows_failed, rows_written=sink.rows_written if streaming else 0)
+    return summary
+
+def _sigterm_to_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def stop_on_sigterm():
+    """SIGTERM (ex.: serviço parado) encerra a análise como Ctrl+C, finalizando tracks e gravações"""
+    signal.signal(signal.SIGTERM, _sigterm_to_interrupt)
+
+def main():
+    args = build_arg_parser().parse_args()
+    stop_on_sigterm()
+    if args.events == "jsonl":
+        set_channel(JsonLinesChannel(sys.stdout))
+    analyze_video(args)
 
 if __name__ == "__main__":
     main()
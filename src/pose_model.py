@@ -0,0 +1,115 @@
+# src/pose_model.py
+import importlib.util, os, shutil, tempfile
+from ultralytics import YOLO
+
+POSE_WEIGHTS = "yolov8n-pose.pt"
+BACKENDS = ("auto", "openvino", "onnx", "torch")
+# Ordem de preferência do modo auto em CPU (mais rápido primeiro)
+AUTO_ORDER = ("openvino", "onnx", "torch")
+_RUNTIME = {"openvino": "openvino", "onnx": "onnxruntime", "torch": "torch"}
+
+def available_backends():
+    """Backends com o runtime instalado"""
+    return [b for b in AUTO_ORDER if importlib.util.find_spec(_RUNTIME[b]) is not None]
+
+def resolve_backend(backend):
+    if backend == "auto":
+        return available_backends()[0]
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend inválido: {backend} (use {', '.join(BACKENDS)})")
+    if importlib.util.find_spec(_RUNTIME[backend]) is None:
+        raise RuntimeError(f"Backend {backend} requer o pacote {_RUNTIME[backend]}")
+    return backend
+
+def export_path(weights, backend, int8=False):
+    """Arquivo (ONNX) ou diretório (OpenVINO) exportado, guardado ao lado dos pesos"""
+    base, _ = os.path.splitext(weights)
+    if backend == "onnx":
+        return base + (".int8.onnx" if int8 else ".onnx")
+    return base + ("_int8_openvino_model" if int8 else "_openvino_model")
+
+def _quantize_onnx(src, dst):
+    """INT8 dinâmico (pesos quantizados) com o ONNX Runtime, mantendo os metadados do YOLO"""
+    import onnx
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(src, dst, weight_type=QuantType.QUInt8)
+    # task/kpt_shape/names ficam nos metadados do ONNX e são lidos pelo ultralytics ao carregar
+    model = onnx.load(dst)
+    del model.metadata_props[:]
+    model.metadata_props.extend(onnx.load(src).metadata_props)
+    onnx.save(model, dst)
+
+def export_model(weights, backend, int8=False):
+    """Exporta os pesos para o backend, uma vez; as próximas execuções reaproveitam o artefato.
+
+    A exportação é feita numa cópia dos pesos em diretório temporário e só depois movida para o
+    lugar definitivo, então workers que sobem juntos não leem um artefato pela metade.
+    """
+    dst = export_path(weights, backend, int8)
+    if os.path.exists(dst) and os.path.getmtime(dst) >= os.path.getmtime(weights):
+        return dst
+    print(f"[INFO] Exportando {weights} para {backend}{' INT8' if int8 else ''} (só na primeira execução)...")
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(weights))) as tmp:
+        tmp_weights = shutil.copy(weights, tmp)
+        model = YOLO(tmp_weights)
+        if backend == "onnx":
+            out = model.export(format="onnx", dynamic=True, simplify=True)
+            if int8:
+                quantized = export_path(tmp_weights, "onnx", int8=True)
+                _quantize_onnx(out, quantized)
+                out = quantized
+        else:
+            # INT8 do OpenVINO usa o NNCF com o dataset de calibração padrão da tarefa de pose
+            out = model.export(format="openvino", dynamic=True, int8=int8)
+        if os.path.isdir(dst):
+            shutil.rmtree(dst, ignore_errors=True)
+        try:
+            os.replace(out, dst)
+        except OSError:
+            if not os.path.exists(dst):
+                raise  # outro processo já exportou em paralelo
+    print(f"[OK] Modelo exportado: {dst}")
+    return dst
+
+def prepare_backend(backend="auto", int8=False, weights=POSE_WEIGHTS):
+    """Resolve o backend e garante o artefato exportado: (backend, caminho do modelo a carregar).
+
+    Chamado uma vez antes de subir vários workers, evita que todos exportem ao mesmo tempo.
+    Se a exportação falhar, cai para o PyTorch.
+    """
+    try:
+        chosen = resolve_backend(backend)
+    except Exception as e:
+        print(f"[ERRO] {e}; usando PyTorch")
+        return "torch", weights
+    if chosen == "torch":
+        return chosen, weights
+    try:
+        if not os.path.exists(weights):
+            weights = YOLO(weights).ckpt_path  # baixa os pesos na primeira execução
+        return chosen, export_model(weights, chosen, int8)
+    except Exception as e:
+        print(f"[ERRO] Falha ao exportar para {chosen}: {e}; usando PyTorch")
+        return "torch", weights
+
+def load_pose_model(backend="auto", int8=False, weights=POSE_WEIGHTS):
+    """YOLO de pose no runtime pedido (auto = o mais rápido instalado: OpenVINO > ONNX Runtime > PyTorch).
+
+    O backend efetivo fica em model.backend_name e é informado na saída.
+    """
+    chosen, path = prepare_backend(backend, int8, weights)
+    if chosen != "torch":
+        try:
+            model = YOLO(path, task="pose")
+            model.backend_name = chosen + ("-int8" if int8 else "")
+            print(f"[INFO] Backend de inferência: {model.backend_name}")
+            return model
+        except Exception as e:
+            print(f"[ERRO] Falha ao carregar {path}: {e}; usando PyTorch")
+            path = weights
+    model = YOLO(path)
+    model.backend_name = "torch"
+    if int8:
+        print("[INFO] --int8 ignorado no PyTorch (requer onnx ou openvino)")
+    print(f"[INFO] Backend de inferência: {model.backend_name}")
+    return model
@@ -0,0 +1,58 @@
+# src/pose_rules.py
+import numpy as np
+
+# Keypoints COCO usados pelas regras
+NOSE, LEFT_EYE, RIGHT_EYE = 0, 1, 2
+LEFT_WRIST, RIGHT_WRIST = 9, 10
+
+GAZE_COS = 0.7            # cos(45°) ≈ 0.707
+HOLD_WRIST_DIST = (20, 100)
+CART_WRIST_DIST = 30
+
+class FrameRules:
+    """Resultado das regras de pose de um frame, indexado pela ordem das pessoas (ids)"""
+    __slots__ = ("gaze", "holding", "cart_pose")
+
+    def __init__(self, gaze, holding, cart_pose):
+        self.gaze = gaze            # (N, R) bool: pessoa i olhando para a ROI k
+        self.holding = holding      # (N,) bool: punhos em posição de segurar objeto
+        self.cart_pose = cart_pose  # (N,) bool: mãos separadas (colocação no carrinho)
+
+class PoseRules:
+    """Avalia olhar e estado das mãos de todas as pessoas contra todas as ROIs de uma vez.
+
+    Os centros das ROIs são calculados uma única vez; por frame, os cossenos cabeça→ROI
+    formam uma matriz pessoas × ROIs e as distâncias entre punhos saem de uma só operação
+    sobre o kp_xy, então o custo em Python por frame cresce com as pessoas, não com as ROIs.
+    """
+    def __init__(self, rois):
+        # Centro truncado para inteiro, como no cálculo original por ROI
+        self.centers = np.array([(int(np.mean(r["poly"][:, 0])), int(np.mean(r["poly"][:, 1]))) for r in rois],
+                                dtype=np.float64).reshape(-1, 2)
+
+    def evaluate(self, kp_xy, n):
+        """kp_xy: (N, 17, 2) ou None; n: número de pessoas do frame"""
+        r = len(self.centers)
+        if kp_xy is None or len(kp_xy) == 0 or kp_xy.shape[1] <= RIGHT_WRIST:
+            none = np.zeros(n, dtype=bool)
+            return FrameRules(np.zeros((n, r), dtype=bool), none, none.copy())
+        kp = np.asarray(kp_xy, dtype=np.float64)
+
+        # Olhar: direção olhos→nariz comparada com nariz→centro da ROI
+        nose, le, re = kp[:, NOSE], kp[:, LEFT_EYE], kp[:, RIGHT_EYE]
+        head_ok = (nose[:, 0] > 0) & (nose[:, 1] > 0) & (le[:, 0] > 0) & (re[:, 0] > 0)
+        head = nose - (le + re) / 2.0                              # (N, 2)
+        to_roi = self.centers[None, :, :] - nose[:, None, :]       # (N, R, 2)
+        dot = np.einsum("nd,nrd->nr", head, to_roi)
+        mag = np.hypot(head[:, 0], head[:, 1])[:, None] * np.hypot(to_roi[..., 0], to_roi[..., 1])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cos = np.where(mag > 0, dot / mag, 0.0)
+        gaze = head_ok[:, None] & (mag > 0) & (cos > GAZE_COS)
+
+        # Punhos: ambos visíveis e distância entre eles
+        lw, rw = kp[:, LEFT_WRIST], kp[:, RIGHT_WRIST]
+        wrists_ok = (lw[:, 0] > 0) & (lw[:, 1] > 0) & (rw[:, 0] > 0) & (rw[:, 1] > 0)
+        dist = np.hypot(lw[:, 0] - rw[:, 0], lw[:, 1] - rw[:, 1])
+        holding = wrists_ok & (dist > HOLD_WRIST_DIST[0]) & (dist < HOLD_WRIST_DIST[1])
+        cart_pose = wrists_ok & (dist > CART_WRIST_DIST)
+        return FrameRules(gaze, holding, cart_pose)
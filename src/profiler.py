@@ -0,0 +1,150 @@
+# src/profiler.py
+import math, sys, time, tracemalloc
+from collections import Counter
+
+# Buckets logarítmicos (10% de largura) a partir de 10 µs: percentis com erro ≤ 10% e memória
+# constante, então a instrumentação pode ficar sempre ligada, inclusive em câmeras ao vivo
+_MIN_MS = 0.01
+_GROWTH = 1.1
+_LOG_GROWTH = math.log(_GROWTH)
+_NBUCKETS = 200
+# Faixas do histograma resumido do relatório (ms)
+HIST_EDGES_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+now = time.perf_counter
+
+class Timings:
+    """Histograma de tempos de uma etapa; cada instância é alimentada por uma única thread"""
+    __slots__ = ("counts", "n", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * _NBUCKETS
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        ms = seconds * 1000.0
+        b = 0 if ms <= _MIN_MS else min(_NBUCKETS - 1, int(math.log(ms / _MIN_MS) / _LOG_GROWTH) + 1)
+        self.counts[b] += 1
+        self.n += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def since(self, t0):
+        """Registra o tempo desde t0 (profiler.now()) e devolve o instante atual"""
+        t = now()
+        self.add(t - t0)
+        return t
+
+    def __len__(self):
+        return self.n
+
+    @staticmethod
+    def _upper_ms(b):
+        return _MIN_MS * _GROWTH ** b
+
+    def percentile(self, q):
+        if not self.n:
+            return 0.0
+        rank = q / 100.0 * self.n
+        seen = 0
+        for b, c in enumerate(self.counts):
+            seen += c
+            if c and seen >= rank:
+                return min(self._upper_ms(b), self.max * 1000.0)
+        return self.max * 1000.0
+
+    def summary(self):
+        hist = dict.fromkeys([f"<{e}ms" for e in HIST_EDGES_MS] + [f">={HIST_EDGES_MS[-1]}ms"], 0)
+        keys = list(hist)
+        for b, c in enumerate(self.counts):
+            if c:
+                ms = self._upper_ms(b)
+                i = next((i for i, e in enumerate(HIST_EDGES_MS) if ms <= e), len(HIST_EDGES_MS))
+                hist[keys[i]] += c
+        return {
+            "count": self.n, "total_s": round(self.total, 3),
+            "mean_ms": round(1000.0 * self.total / self.n, 3) if self.n else 0.0,
+            "p50_ms": round(self.percentile(50), 3), "p90_ms": round(self.percentile(90), 3),
+            "p99_ms": round(self.percentile(99), 3), "max_ms": round(self.max * 1000.0, 3),
+            "hist": hist,
+        }
+
+def count_summary(counter):
+    """Resumo de uma distribuição de contagens por frame (ex.: pessoas por frame)"""
+    n = sum(counter.values())
+    if not n:
+        return {"frames": 0, "mean": 0.0, "max": 0, "hist": {}}
+    return {
+        "frames": n,
+        "mean": round(sum(k * c for k, c in counter.items()) / n, 3),
+        "max": max(counter),
+        "hist": {str(k): counter[k] for k in sorted(counter)},
+    }
+
+def peak_rss_mb():
+    """Pico de memória residente do processo em MB (None se indisponível)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss: KB no Linux, bytes no macOS
+        return round(peak / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        mem = psutil.Process().memory_info()
+        return round(getattr(mem, "peak_wset", mem.rss) / (1024.0 * 1024.0), 1)
+    except Exception:
+        return None
+
+class RunProfiler:
+    """Coleta o relatório de desempenho de uma análise.
+
+    As etapas são objetos Timings mantidos por quem executa cada uma (leitor, tracker,
+    gravador...); o profiler só guarda as etapas do loop principal, as contagens por frame
+    e, com trace_memory=True, os maiores alocadores via tracemalloc.
+    """
+    def __init__(self, trace_memory=False, top=10):
+        self.trace_memory = trace_memory
+        self.top = top
+        self.stages = {}
+        self.persons = Counter()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stage(self, name):
+        timings = self.stages.get(name)
+        if timings is None:
+            timings = self.stages[name] = Timings()
+        return timings
+
+    def _top_allocators(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        return [{"where": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 "size_kb": round(stat.size / 1024.0, 1), "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:self.top]]
+
+    def report(self, stages=None, **info):
+        """Relatório JSON-serializável: info da execução, histogramas por etapa, pessoas por frame e memória.
+        stages: {nome: Timings} na ordem do relatório (etapas vazias ou None são omitidas); as
+        etapas do profiler que não estiverem ali entram no fim"""
+        all_stages = {k: v for k, v in (stages or {}).items() if v is not None and len(v)}
+        all_stages.update({k: v for k, v in self.stages.items() if k not in all_stages and len(v)})
+        memory = {"peak_rss_mb": peak_rss_mb()}
+        if self.trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            memory.update(traced_current_mb=round(current / 1048576.0, 1), traced_peak_mb=round(peak / 1048576.0, 1),
+                          top_allocators=self._top_allocators())
+            tracemalloc.stop()
+        return {
+            **info,
+            "stages": {name: t.summary() for name, t in all_stages.items()},
+            "persons_per_frame": count_summary(self.persons),
+            "memory": memory,
+        }
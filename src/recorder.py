@@ -0,0 +1,161 @@
+# src/recorder.py
+import json, math, os
+from array import array
+from db_oracle import _ts
+
+class StringTable:
+    """Strings internadas: cada valor distinto é guardado uma vez e referenciado por código (-1 = None)"""
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def code(self, value):
+        if value is None:
+            return -1
+        c = self.codes.get(value)
+        if c is None:
+            c = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return c
+
+    def value(self, code):
+        return None if code < 0 else self.values[code]
+
+def _conf(value):
+    return math.nan if value is None else float(value)
+
+def _unconf(value):
+    return None if math.isnan(value) else value
+
+def _event_cols():
+    return {"ts": array("d"), "evt": array("i"), "roi": array("i"), "conf": array("d")}
+
+def _object_cols():
+    return {"ts": array("d"), "obj_type": array("i"), "roi": array("i"), "action": array("i"), "conf": array("d")}
+
+class PersonRows:
+    """Eventos e objetos de uma pessoa em cena, já em colunas com os códigos da tabela de strings
+    da câmera; vão para o ColumnarRecorder (por extend, sem objeto por linha) quando a pessoa
+    é finalizada como válida"""
+    __slots__ = ("strings", "events", "event_extra", "objects")
+
+    def __init__(self, strings):
+        self.strings = strings
+        self.events = _event_cols()
+        self.event_extra = []  # JSON (str) ou None
+        self.objects = _object_cols()
+
+    def add_event(self, ts, event_type, roi_id, conf, extra=None):
+        code, cols = self.strings.code, self.events
+        cols["ts"].append(ts); cols["evt"].append(code(event_type)); cols["roi"].append(code(roi_id)); cols["conf"].append(_conf(conf))
+        self.event_extra.append(json.dumps(extra) if extra else None)
+
+    def add_object(self, ts, object_type, roi_id, action, conf):
+        code, cols = self.strings.code, self.objects
+        cols["ts"].append(ts); cols["obj_type"].append(code(object_type)); cols["roi"].append(code(roi_id))
+        cols["action"].append(code(action)); cols["conf"].append(_conf(conf))
+
+    def __len__(self):
+        return len(self.events["ts"])
+
+class ColumnarRecorder:
+    """Registro colunar (struct-of-arrays) das linhas de uma análise: o armazenamento principal
+    das linhas da câmera.
+
+    Cada tabela é um conjunto de colunas array('d'/'f'/'i') com strings internadas (pessoa, ROI,
+    tipo de evento, ação), em vez de um objeto por linha; eventos, objetos (PersonRows) e
+    caminhos (TrajectoryCompressor) já são gravados em colunas enquanto a pessoa está em cena.
+    drain() monta, a partir das colunas, os binds do executemany das linhas novas; com keep=True
+    as colunas continuam na memória e são exportadas para Parquet ao fim da análise.
+    """
+    def __init__(self, camera_id, keep=False):
+        self.camera_id = camera_id
+        self.keep = keep
+        self.strings = StringTable()
+        self.paths = {"ts": array("d"), "pid": array("i"), "x": array("f"), "y": array("f"), "roi": array("i")}
+        self.events = {**_event_cols(), "pid": array("i")}
+        self.event_extra = []
+        self.objects = {**_object_cols(), "pid": array("i")}
+        self.sessions = {"ts": array("d"), "pid": array("i")}
+        self._drained = {"paths": 0, "events": 0, "objects": 0, "sessions": 0}
+
+    def person_rows(self):
+        return PersonRows(self.strings)
+
+    @staticmethod
+    def _extend(table, cols, p):
+        n = len(cols["ts"])
+        for k, col in cols.items():
+            table[k].extend(col)
+        table["pid"].extend(array("i", [p]) * n)
+
+    def add_person(self, pid, person):
+        """Acrescenta as colunas de uma pessoa finalizada às da câmera"""
+        p = self.strings.code(pid)
+        self._extend(self.events, person.rows.events, p)
+        self.event_extra.extend(person.rows.event_extra)
+        self._extend(self.objects, person.rows.objects, p)
+        path = person.path.finish()
+        self._extend(self.paths, {"ts": path.ts, "x": path.x, "y": path.y, "roi": path.roi}, p)
+        if person.session_ts is not None:
+            self.sessions["ts"].append(person.session_ts); self.sessions["pid"].append(p)
+
+    def __len__(self):
+        return sum(len(t["ts"]) for t in (self.paths, self.events, self.objects, self.sessions))
+
+    def _slice(self, name, cols):
+        start = self._drained[name]
+        self._drained[name] = len(cols["ts"])
+        return start, {k: v[start:] for k, v in cols.items()}
+
+    def drain(self):
+        """Linhas adicionadas desde o último drain, como binds do executemany:
+        (eventos, objetos, posições, sessões) na ordem das colunas de db_oracle._insert_rows"""
+        sv, cam = self.strings.value, self.camera_id
+        start, c = self._slice("events", self.events)
+        events = list(zip(map(_ts, c["ts"]), map(sv, c["pid"]), [cam] * len(c["ts"]), map(sv, c["evt"]),
+                          map(sv, c["roi"]), map(_unconf, c["conf"]), self.event_extra[start:]))
+        _, c = self._slice("objects", self.objects)
+        objects = list(zip(map(_ts, c["ts"]), map(sv, c["pid"]), [cam] * len(c["ts"]), map(sv, c["obj_type"]),
+                           map(sv, c["roi"]), map(sv, c["action"]), map(_unconf, c["conf"])))
+        _, c = self._slice("paths", self.paths)
+        paths = list(zip(map(_ts, c["ts"]), map(sv, c["pid"]), [cam] * len(c["ts"]), c["x"], c["y"], map(sv, c["roi"])))
+        # Sessões usam :ts duas vezes no INSERT, então vão como dict (uma por pessoa)
+        _, c = self._slice("sessions", self.sessions)
+        sessions = [{'ts': _ts(ts), 'pid': sv(p), 'cam': cam} for ts, p in zip(c["ts"], c["pid"])]
+        if not self.keep:
+            self._clear()
+        return events, objects, paths, sessions
+
+    def _clear(self):
+        for cols in (self.paths, self.events, self.objects, self.sessions):
+            for col in cols.values():
+                del col[:]
+        del self.event_extra[:]
+        self._drained = dict.fromkeys(self._drained, 0)
+
+    def to_parquet(self, out_dir):
+        """Exporta as tabelas para out_dir/<tabela>.parquet (requer pandas + pyarrow)"""
+        import numpy as np
+        import pandas as pd
+        os.makedirs(out_dir, exist_ok=True)
+        names = self.strings.values
+        def strings(col):
+            # Códigos internados viram colunas categóricas (-1 = nulo)
+            return pd.Categorical.from_codes(np.frombuffer(col, dtype=np.int32), categories=names) if names else [None] * len(col)
+        tables = {
+            "caminhos_cliente": {"ts": self.paths["ts"], "pid": strings(self.paths["pid"]), "x": self.paths["x"],
+                                 "y": self.paths["y"], "roi": strings(self.paths["roi"])},
+            "eventos_loja": {"ts": self.events["ts"], "pid": strings(self.events["pid"]), "evt": strings(self.events["evt"]),
+                             "roi": strings(self.events["roi"]), "conf": self.events["conf"], "extra": self.event_extra},
+            "objetos_cliente": {"ts": self.objects["ts"], "pid": strings(self.objects["pid"]),
+                                "obj_type": strings(self.objects["obj_type"]), "roi": strings(self.objects["roi"]),
+                                "action": strings(self.objects["action"]), "conf": self.objects["conf"]},
+            "sessoes_cliente": {"ts": self.sessions["ts"], "pid": strings(self.sessions["pid"])},
+        }
+        for name, cols in tables.items():
+            df = pd.DataFrame({k: (np.asarray(v) if isinstance(v, array) else v) for k, v in cols.items()})
+            df.insert(0, "cam", self.camera_id)
+            df["ts"] = pd.to_datetime(df["ts"], unit="s", utc=True)
+            df.to_parquet(os.path.join(out_dir, f"{name}.parquet"), index=False)
+        return out_dir
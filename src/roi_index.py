@@ -0,0 +1,52 @@
+# src/roi_index.py
+import cv2
+import numpy as np
+
+MAX_ROIS = 64
+
+class RoiIndex:
+    """Raster de rótulos das ROIs: pertinência de ponto por lookup em array, sem pointPolygonTest.
+
+    Cada ROI ocupa um bit do raster (do tamanho do frame), então ROIs sobrepostas continuam
+    corretas: o valor do pixel é a máscara de todas as ROIs que contêm o ponto. Construído uma
+    vez; a consulta de todas as pessoas do frame é uma única indexação vetorizada.
+    """
+    def __init__(self, rois, frame_shape):
+        if len(rois) > MAX_ROIS:
+            raise ValueError(f"No máximo {MAX_ROIS} ROIs por vídeo (recebidas {len(rois)})")
+        h, w = frame_shape[:2]
+        self.names = [r["name"] for r in rois]
+        dtype = next(t for t in (np.uint8, np.uint16, np.uint32, np.uint64) if np.iinfo(t).bits >= max(1, len(rois)))
+        self.raster = np.zeros((h, w), dtype=dtype)
+        mask = np.zeros((h, w), dtype=np.uint8)
+        for k, r in enumerate(rois):
+            mask[:] = 0
+            cv2.fillPoly(mask, [r["poly"]], 1)
+            # Contorno incluído, como pointPolygonTest(...) >= 0
+            cv2.polylines(mask, [r["poly"]], True, 1, 1)
+            self.raster[mask > 0] |= dtype(1 << k)
+
+    def lookup(self, points):
+        """Máscara de ROIs (int por ponto) para um array (N, 2) de pontos em pixels"""
+        pts = np.rint(np.asarray(points, dtype=np.float64).reshape(-1, 2)).astype(np.int64)
+        h, w = self.raster.shape
+        inside = (pts[:, 0] >= 0) & (pts[:, 0] < w) & (pts[:, 1] >= 0) & (pts[:, 1] < h)
+        bits = np.zeros(len(pts), dtype=np.uint64)
+        bits[inside] = self.raster[pts[inside, 1], pts[inside, 0]]
+        return [int(b) for b in bits]
+
+    def mask_of(self, indices):
+        m = 0
+        for k in indices:
+            m |= 1 << k
+        return m
+
+    def first(self, bits):
+        """Nome da primeira ROI (na ordem do rois.json) que contém o ponto, ou None"""
+        if not bits:
+            return None
+        return self.names[(bits & -bits).bit_length() - 1]
+
+    @staticmethod
+    def contains(bits, k):
+        return (bits >> k) & 1 == 1
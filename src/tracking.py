@@ -0,0 +1,325 @@
+# src/tracking.py
+import cv2
+import numpy as np
+from profiler import Timings, now
+
+def empty_detections():
+    return [], np.zeros((0, 4), dtype=np.float32), None
+
+def predict_batch(model, frames, conf=0.3, iou=0.5, imgsz=None):
+    """Roda YOLO pose em um lote de frames numa única chamada (sem tracking)"""
+    kwargs = {"imgsz": imgsz} if imgsz else {}
+    return model.predict(frames, verbose=False, conf=conf, iou=iou, **kwargs)
+
+def roi_crop_box(rois, frame_shape, pad=64):
+    """Caixa (x0, y0, x1, y1) que envolve todas as ROIs, com margem, limitada ao frame"""
+    h, w = frame_shape[:2]
+    pts = np.concatenate([r["poly"].reshape(-1, 2) for r in rois])
+    x0, y0 = pts.min(axis=0) - pad
+    x1, y1 = pts.max(axis=0) + pad + 1
+    return max(0, int(x0)), max(0, int(y0)), min(w, int(x1)), min(h, int(y1))
+
+def make_bytetrack(frame_rate=30):
+    from ultralytics.trackers.byte_tracker import BYTETracker
+    from ultralytics.utils import YAML, IterableSimpleNamespace
+    from ultralytics.utils.checks import check_yaml
+    cfg = IterableSimpleNamespace(**YAML.load(check_yaml("bytetrack.yaml")))
+    # frame_rate = atualizações do tracker por segundo (define por quantas atualizações um
+    # track perdido é mantido: max_time_lost)
+    return BYTETracker(args=cfg, frame_rate=max(1, int(round(frame_rate))))
+
+class PoseTracker:
+    """YOLO pose + ByteTrack com estado de tracking próprio.
+
+    Equivale ao model.track(persist=True), mas separa a inferência (que pode ser em lote)
+    da atualização do tracker, que é sempre feita frame a frame e em ordem.
+    Com crop=(x0, y0, x1, y1) o modelo só recebe esse recorte do frame; caixas e keypoints
+    voltam deslocados para coordenadas do frame inteiro.
+    """
+    def __init__(self, model, frame_rate=30, conf=0.3, iou=0.5, imgsz=None, crop=None):
+        self.model = model
+        self.conf = conf
+        self.iou = iou
+        self.imgsz = imgsz
+        self.crop = crop
+        self.tracker = make_bytetrack(frame_rate)
+        self.infer_s = Timings()  # por chamada do modelo (lote)
+        self.track_s = Timings()  # ByteTrack + conversão do resultado, por frame
+
+    def update(self, result):
+        """Atualiza o ByteTrack com o resultado de um frame e devolve (ids, xyxys, kp_xy)"""
+        t0 = now()
+        det = result.boxes.cpu().numpy()
+        tracks = self.tracker.update(det, result.orig_img)
+        if len(tracks) == 0:
+            self.track_s.since(t0)
+            return empty_detections()
+        idx = tracks[:, -1].astype(int)
+        ids = tracks[:, 4].astype(int).tolist()
+        xyxys = tracks[:, :4].astype(np.float32)
+        kp_xy = result.keypoints.xy.cpu().numpy()[idx] if result.keypoints is not None else None
+        if self.crop is not None:
+            # Recorte -> frame inteiro; keypoints não detectados (0,0) continuam zerados
+            x0, y0 = self.crop[:2]
+            xyxys += (x0, y0, x0, y0)
+            if kp_xy is not None:
+                visible = (kp_xy[..., 0] > 0) & (kp_xy[..., 1] > 0)
+                kp_xy[visible] += (x0, y0)
+        self.track_s.since(t0)
+        return ids, xyxys, kp_xy
+
+    def prepare(self, frame):
+        """Frame como o modelo deve recebê-lo (recortado quando há crop)"""
+        if self.crop is None:
+            return frame
+        x0, y0, x1, y1 = self.crop
+        return np.ascontiguousarray(frame[y0:y1, x0:x1])
+
+    def track_batch(self, frames):
+        frames = [self.prepare(f) for f in frames]
+        t0 = now()
+        results = predict_batch(self.model, frames, self.conf, self.iou, self.imgsz)
+        self.infer_s.since(t0)
+        return [self.update(r) for r in results]
+
+class TrackPropagator:
+    """Propaga centros das caixas e keypoints entre keyframes com fluxo óptico esparso (Lucas-Kanade).
+
+    No keyframe recebe as detecções do modelo (reset); nos frames intermediários move cada
+    ponto visível pelo fluxo óptico calculado numa cópia reduzida em tons de cinza (step).
+    Keypoints não detectados (0,0) continuam zerados, como a saída do YOLO.
+    """
+    def __init__(self, scale=0.5):
+        self.scale = scale
+        self.prev_gray = None
+        self.ids = []
+        self.xyxys = np.zeros((0, 4), dtype=np.float32)
+        self.kp_xy = None
+
+    def _gray(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.scale != 1.0:
+            gray = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return gray
+
+    def reset(self, frame, ids, xyxys, kp_xy):
+        self.prev_gray = self._gray(frame)
+        self.ids = list(ids)
+        self.xyxys = np.asarray(xyxys, dtype=np.float32).copy()
+        self.kp_xy = None if kp_xy is None else np.asarray(kp_xy, dtype=np.float32).copy()
+
+    def step(self, frame):
+        gray = self._gray(frame)
+        if self.prev_gray is None or not self.ids:
+            self.prev_gray = gray
+            return self.ids, self.xyxys, self.kp_xy
+
+        n = len(self.ids)
+        centers = np.stack([(self.xyxys[:, 0] + self.xyxys[:, 2]) / 2.0,
+                            (self.xyxys[:, 1] + self.xyxys[:, 3]) / 2.0], axis=1)
+        # Pontos por pessoa: [centro, keypoints...]
+        if self.kp_xy is not None:
+            pts = np.concatenate([centers[:, None, :], self.kp_xy], axis=1)
+        else:
+            pts = centers[:, None, :]
+        visible = (pts[..., 0] > 0) & (pts[..., 1] > 0)
+        if not visible.any():
+            self.prev_gray = gray
+            return self.ids, self.xyxys, self.kp_xy
+        flat = pts[visible].reshape(-1, 1, 2) * self.scale
+
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, flat.astype(np.float32), None,
+                                                    winSize=(15, 15), maxLevel=2)
+        self.prev_gray = gray
+        if moved is None:
+            return self.ids, self.xyxys, self.kp_xy
+
+        new_pts = pts.copy()
+        ok = np.zeros(pts.shape[:2], dtype=bool)
+        new_pts[visible] = moved.reshape(-1, 2) / self.scale
+        ok[visible] = status.reshape(-1).astype(bool)
+        disp = new_pts - pts
+
+        for i in range(n):
+            if not ok[i].any():
+                continue
+            # Deslocamento da pessoa = mediana dos pontos rastreados com sucesso
+            d = np.median(disp[i][ok[i]], axis=0)
+            self.xyxys[i] += (d[0], d[1], d[0], d[1])
+            if self.kp_xy is not None:
+                kp_vis = visible[i, 1:]
+                kp_ok = ok[i, 1:]
+                # Keypoint rastreado usa o próprio fluxo; visível mas perdido segue a pessoa
+                self.kp_xy[i][kp_ok] = new_pts[i, 1:][kp_ok]
+                self.kp_xy[i][kp_vis & ~kp_ok] += d
+        return self.ids, self.xyxys, self.kp_xy
+
+class MotionGate:
+    """Decide se um keyframe precisa de inferência: diferença de frames numa cópia reduzida, só na área das ROIs.
+
+    A referência é o último frame que passou pelo modelo, então movimentos lentos se acumulam
+    até disparar. Frames sem mudança em pelo menos min_fraction dos pixels das ROIs são
+    "bloqueados" e reaproveitam as últimas detecções. Com max_skip > 0 a inferência é forçada
+    depois desse número de keyframes seguidos bloqueados.
+    """
+    def __init__(self, rois, scale=0.25, pixel_thresh=25, min_fraction=0.005, max_skip=0, pad=16):
+        self.rois = rois
+        self.scale = scale
+        self.pixel_thresh = pixel_thresh
+        self.min_fraction = min_fraction
+        self.max_skip = max_skip
+        self.pad = pad
+        self.mask = None
+        self.reference = None
+        self.skipped = 0
+
+    def _gray(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        gray = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def _build_mask(self, shape):
+        self.mask = np.zeros(shape, dtype=np.uint8)
+        for r in self.rois:
+            poly = np.round(r["poly"].reshape(-1, 2) * self.scale).astype(np.int32)
+            cv2.fillPoly(self.mask, [poly], 255)
+        # Margem em volta das ROIs: pessoas se aproximando também contam como movimento
+        k = max(1, int(self.pad * self.scale))
+        self.mask = cv2.dilate(self.mask, np.ones((2 * k + 1, 2 * k + 1), np.uint8))
+        self.mask_pixels = max(1, int(np.count_nonzero(self.mask)))
+
+    def needs_inference(self, frame):
+        gray = self._gray(frame)
+        if self.mask is None:
+            self._build_mask(gray.shape)
+        if self.reference is not None and not (self.max_skip and self.skipped >= self.max_skip):
+            diff = cv2.absdiff(gray, self.reference)
+            changed = cv2.countNonZero(cv2.bitwise_and(cv2.threshold(diff, self.pixel_thresh, 255, cv2.THRESH_BINARY)[1], self.mask))
+            if changed < self.min_fraction * self.mask_pixels:
+                self.skipped += 1
+                return False
+        self.reference = gray
+        self.skipped = 0
+        return True
+
+class DetectionPipeline:
+    """Entrega, em ordem, (índice, posição_ms, frame, (ids, xyxys, kp_xy)) para cada frame lido.
+
+    Acumula até batch_size keyframes e roda a inferência do lote numa única chamada; com
+    detect_every > 1 os frames entre keyframes recebem posições propagadas pelo TrackPropagator.
+    Com um MotionGate, keyframes sem movimento nas ROIs não vão para o modelo: reaproveitam as
+    últimas detecções (ou a propagação) e o ByteTrack não é atualizado, então os tracks não
+    envelhecem nem se perdem durante o intervalo parado.
+    """
+    def __init__(self, frames, pose_tracker, batch_size=1, detect_every=1, gate=None):
+        self.frames = frames
+        self.pose_tracker = pose_tracker
+        self.batch_size = max(1, batch_size)
+        self.detect_every = max(1, detect_every)
+        self.gate = gate
+        self.propagator = TrackPropagator() if self.detect_every > 1 else None
+        # Sem MotionGate um lote completo cabe em (batch_size - 1) * detect_every + 1 frames
+        self.max_pending = self.batch_size * self.detect_every
+        self.last_det = empty_detections()
+        self.frames_processed = 0
+        self.frames_gated = 0
+        self.keyframes = 0
+        self.batches = 0
+        self.gate_s = Timings()
+        self.propagate_s = Timings()
+
+    def schedule(self, frame):
+        """Decide se o próximo frame é keyframe (vai para o modelo)"""
+        is_key = self.frames_processed % self.detect_every == 0
+        self.frames_processed += 1
+        if is_key and self.gate is not None:
+            t0 = now()
+            if not self.gate.needs_inference(frame):
+                is_key = False
+                self.frames_gated += 1
+            self.gate_s.since(t0)
+        return is_key
+
+    def resolve(self, frame, is_key, det=None):
+        """Detecções do frame: as do modelo (keyframe), propagadas ou as últimas (bloqueado pelo MotionGate)"""
+        if is_key:
+            self.keyframes += 1
+            if self.propagator is not None:
+                self.propagator.reset(frame, *det)
+        elif self.propagator is not None:
+            t0 = now()
+            det = self.propagator.step(frame)
+            self.propagate_s.since(t0)
+        else:
+            det = self.last_det
+        self.last_det = det
+        return det
+
+    def _flush(self, pending):
+        keyframes = [pkt[2] for pkt, is_key in pending if is_key]
+        dets = iter(self.pose_tracker.track_batch(keyframes) if keyframes else [])
+        if keyframes:
+            self.batches += 1
+        for pkt, is_key in pending:
+            yield (*pkt, self.resolve(pkt[2], is_key, next(dets) if is_key else None))
+
+    def __iter__(self):
+        pending = []
+        n_keys = 0
+        for pkt in self.frames:
+            is_key = self.schedule(pkt[2])
+            pending.append((pkt, is_key))
+            n_keys += is_key
+            # Sem keyframe pendente o frame já pode ser entregue (propagado), sem esperar o lote.
+            # Lote parcial sai ao atingir batch_size * detect_every frames: sem isso, com o MotionGate
+            # bloqueando uma cena parada, todos os frames ficariam retidos esperando keyframes
+            if n_keys >= self.batch_size or n_keys == 0 or len(pending) >= self.max_pending:
+                yield from self._flush(pending)
+                pending, n_keys = [], 0
+        if pending:
+            yield from self._flush(pending)
+
+class MultiCameraPipeline:
+    """Várias câmeras com um único modelo: a cada rodada lê um frame de cada câmera e roda os
+    keyframes de todas numa só chamada de inferência.
+
+    Cada câmera mantém o próprio DetectionPipeline (ByteTrack, propagação, MotionGate); só a
+    inferência é compartilhada. Entrega, em ordem por câmera, (câmera, (índice, posição_ms,
+    frame, detecções)); uma câmera que termina sai da rodada e as demais continuam.
+    """
+    def __init__(self, model, pipelines, conf=0.3, iou=0.5, imgsz=None):
+        self.model = model
+        self.pipelines = pipelines
+        self.conf = conf
+        self.iou = iou
+        self.imgsz = imgsz
+        self.batches = 0
+        self.rounds = 0
+        self.infer_s = Timings()
+
+    def __iter__(self):
+        sources = [iter(p.frames) for p in self.pipelines]
+        active = list(range(len(self.pipelines)))
+        while active:
+            round_pkts = []
+            for cam in list(active):
+                pkt = next(sources[cam], None)
+                if pkt is None:
+                    active.remove(cam)
+                    continue
+                round_pkts.append((cam, pkt, self.pipelines[cam].schedule(pkt[2])))
+            if not round_pkts:
+                break
+            self.rounds += 1
+            keys = [(cam, pkt) for cam, pkt, is_key in round_pkts if is_key]
+            results = iter([])
+            if keys:
+                t0 = now()
+                results = iter(predict_batch(self.model, [self.pipelines[cam].pose_tracker.prepare(pkt[2]) for cam, pkt in keys],
+                                             self.conf, self.iou, self.imgsz))
+                self.infer_s.since(t0)
+                self.batches += 1
+            for cam, pkt, is_key in round_pkts:
+                pipe = self.pipelines[cam]
+                det = pipe.pose_tracker.update(next(results)) if is_key else None
+                yield cam, (*pkt, pipe.resolve(pkt[2], is_key, det))
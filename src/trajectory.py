@@ -0,0 +1,104 @@
+# src/trajectory.py
+import math
+from array import array
+
+PATH_MODES = ("dp", "distance", "sample")
+
+class TrajectoryConfig:
+    """Parâmetros de compressão dos caminhos, compartilhados por todas as pessoas do vídeo"""
+    __slots__ = ("mode", "eps", "min_dist", "max_gap", "every", "max_pending")
+
+    def __init__(self, mode="dp", eps=8.0, min_dist=25.0, max_gap=2.0, every=20, max_pending=512):
+        if mode not in PATH_MODES:
+            raise ValueError(f"Modo de caminho inválido: {mode} (use {', '.join(PATH_MODES)})")
+        self.mode = mode
+        self.eps = eps            # dp: erro máximo em pixels
+        self.min_dist = min_dist  # distance: deslocamento mínimo em pixels
+        self.max_gap = max_gap    # dp/distance: segundos máximos sem gravar ponto (0 = sem limite)
+        self.every = max(1, every)  # sample: 1 a cada N posições
+        self.max_pending = max_pending
+
+def _seg_dist(p, a, b):
+    """Distância do ponto p ao segmento a-b (tuplas (ts, x, y, roi))"""
+    ax, ay, bx, by = a[1], a[2], b[1], b[2]
+    dx, dy = bx - ax, by - ay
+    den = dx * dx + dy * dy
+    if den == 0:
+        return math.hypot(p[1] - ax, p[2] - ay)
+    t = max(0.0, min(1.0, ((p[1] - ax) * dx + (p[2] - ay) * dy) / den))
+    return math.hypot(p[1] - (ax + t * dx), p[2] - (ay + t * dy))
+
+class TrajectoryCompressor:
+    """Simplifica o caminho de uma pessoa à medida que as posições chegam.
+
+    Modos:
+      dp       — Douglas-Peucker em fluxo (janela aberta): um ponto só é gravado quando a reta
+                 desde o último ponto gravado deixaria alguma posição intermediária a mais de
+                 eps pixels; cantos são preservados e pessoas paradas geram poucos pontos.
+      distance — grava quando a pessoa anda min_dist pixels desde o último ponto gravado.
+      sample   — 1 a cada N posições (comportamento antigo).
+    Em dp/distance também é gravado um ponto a cada max_gap segundos, para o tempo parado
+    continuar pesando no mapa de calor. Em todos os modos a entrada e a saída de uma ROI
+    geram pontos (o último fora/dentro e o primeiro dentro/fora), e a última posição vista
+    é gravada em finish().
+    roi é o código inteiro da ROI (recorder.StringTable, -1 = fora); os pontos gravados ficam
+    em colunas (ts, x, y, roi), sem um objeto por ponto.
+    """
+    __slots__ = ("cfg", "ts", "x", "y", "roi", "count", "_anchor", "_pending", "_last")
+
+    def __init__(self, cfg=None):
+        self.cfg = cfg or TrajectoryConfig()
+        self.ts, self.x, self.y, self.roi = array("d"), array("f"), array("f"), array("i")
+        self.count = 0     # posições recebidas
+        self._anchor = None
+        self._pending = []
+        self._last = None
+
+    def _keep(self, p):
+        self.ts.append(p[0]); self.x.append(p[1]); self.y.append(p[2]); self.roi.append(p[3])
+        self._anchor = p
+        self._pending = []
+
+    def add(self, ts, x, y, roi):
+        p = (ts, float(x), float(y), roi)
+        self.count += 1
+        last, self._last = self._last, p
+        cfg = self.cfg
+        if self._anchor is None:
+            self._keep(p)
+            return
+        # Entrada/saída de ROI: fecha o trecho anterior e marca o primeiro ponto do novo
+        if roi != last[3]:
+            if last is not self._anchor:
+                self._keep(last)
+            self._keep(p)
+            return
+
+        if cfg.mode == "sample":
+            if (self.count - 1) % cfg.every == 0:
+                self._keep(p)
+            return
+
+        a = self._anchor
+        if cfg.mode == "distance":
+            if math.hypot(p[1] - a[1], p[2] - a[2]) >= cfg.min_dist or (cfg.max_gap and ts - a[0] >= cfg.max_gap):
+                self._keep(p)
+            return
+
+        # dp: todos os pontos pendentes precisam ficar a até eps da reta âncora -> p
+        if any(_seg_dist(q, a, p) > cfg.eps for q in self._pending) or len(self._pending) >= cfg.max_pending:
+            self._keep(last)
+            a = last
+        if cfg.max_gap and ts - a[0] >= cfg.max_gap:
+            self._keep(p)
+        else:
+            self._pending.append(p)
+
+    def __len__(self):
+        return len(self.ts)
+
+    def finish(self):
+        """Grava a última posição (se ainda não gravada) e devolve o compressor (colunas ts, x, y, roi)"""
+        if self._last is not None and self._last is not self._anchor:
+            self._keep(self._last)
+        return self
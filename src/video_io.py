@@ -0,0 +1,213 @@
+# src/video_io.py
+import queue, threading, time
+import datetime as dt
+import cv2
+from profiler import Timings, now
+
+_END = object()
+
+class FrameReader:
+    """Decodifica frames do cv2.VideoCapture em uma thread própria, à frente da inferência.
+
+    A fila é limitada (queue_size): quando a inferência atrasa, o decoder bloqueia em vez de
+    acumular frames na memória. Com queue_size=0 a leitura é feita de forma síncrona.
+    Itera em tuplas (índice_do_frame, posição_ms, frame); a posição é lida do
+    CAP_PROP_POS_MSEC logo após a decodificação, na mesma thread do decoder.
+    Com stride > 1 só cada N-ésimo frame é entregue; os demais passam por grab()
+    sem retrieve(), evitando a conversão de cor e a cópia para a fila.
+    """
+    def __init__(self, cap, queue_size=4, stride=1):
+        self.cap = cap
+        self.queue_size = queue_size
+        self.stride = max(1, stride)
+        self.frames_read = 0
+        self.frames_decoded = 0
+        self.decode_s = Timings()  # tempo de decodificação por frame entregue (inclui os grab() do stride)
+        self._stop = threading.Event()
+        self._thread = None
+        if queue_size > 0:
+            self._q = queue.Queue(maxsize=queue_size)
+            self._thread = threading.Thread(target=self._run, name="frame-decoder", daemon=True)
+            self._thread.start()
+
+    def _put(self, item):
+        # put com timeout para conseguir encerrar mesmo com a fila cheia
+        while not self._stop.is_set():
+            try:
+                self._q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read(self):
+        """Lê o próximo frame analisado, pulando (stride - 1) frames com grab()"""
+        t0 = now()
+        idx = self.frames_decoded
+        if idx % self.stride:
+            for _ in range(self.stride - idx % self.stride):
+                if not self.cap.grab():
+                    return None
+                self.frames_decoded += 1
+            idx = self.frames_decoded
+        ok, frame = self.cap.read()
+        if not ok:
+            return None
+        self.frames_decoded += 1
+        self.decode_s.since(t0)
+        return idx, self.cap.get(cv2.CAP_PROP_POS_MSEC), frame
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                item = self._read()
+                if item is None or not self._put(item):
+                    break
+        finally:
+            self._put(_END)
+
+    def __iter__(self):
+        if self._thread is None:
+            while not self._stop.is_set():
+                item = self._read()
+                if item is None:
+                    return
+                self.frames_read += 1
+                yield item
+            return
+        while True:
+            item = self._q.get()
+            if item is _END:
+                return
+            self.frames_read += 1
+            yield item
+
+    def stop(self):
+        """Interrompe o decoder e aguarda a thread terminar (antes de liberar o VideoCapture)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+def parse_start_time(value):
+    """Converte --video-start (epoch em segundos ou data ISO 8601) em epoch; None usa o horário atual"""
+    if value is None:
+        return time.time()
+    try:
+        return float(value)
+    except ValueError:
+        return dt.datetime.fromisoformat(value).timestamp()
+
+class MediaClock:
+    """Relógio de mídia: timestamps derivados da posição no vídeo, não do relógio de parede.
+
+    As regras (dwell, gaze, depart, hold) passam a medir tempo do vídeo, então o resultado
+    não depende da velocidade de processamento. ts = start_epoch + segundos de mídia.
+    """
+    def __init__(self, fps, start_epoch):
+        self.fps = fps if fps and fps > 0 else 30.0
+        self.start_epoch = start_epoch
+        self.position = 0.0
+
+    def media_seconds(self, frame_idx, pos_msec=None):
+        # CAP_PROP_POS_MSEC quando o backend fornece; senão índice do frame / FPS
+        t = pos_msec / 1000.0 if pos_msec and pos_msec > 0 else frame_idx / self.fps
+        # Mantém o relógio monotônico mesmo com PTS irregulares
+        self.position = max(self.position, t)
+        return self.position
+
+    def ts(self, frame_idx, pos_msec=None):
+        return self.start_epoch + self.media_seconds(frame_idx, pos_msec)
+
+class LiveFrameReader:
+    """Leitura de câmera ao vivo (RTSP/HTTP/índice de dispositivo) sempre entregando o frame mais recente.
+
+    A captura roda em thread própria e guarda só o último frame: se a análise atrasar, os
+    frames intermediários são descartados (frames_dropped) em vez de enfileirados, então a
+    latência captura→evento fica limitada ao tempo de processar um frame. Se o stream cair,
+    reabre a conexão após reconnect_delay segundos (max_reconnects < 0 = sem limite).
+    Com simulate=True um arquivo é reproduzido no ritmo nativo (FPS do vídeo), como uma câmera.
+    Itera em (índice_capturado, ms_desde_o_início, frame); a posição é o relógio de parede
+    da captura, então start_wall + posição = instante em que o frame foi capturado.
+    """
+    def __init__(self, source, simulate=False, reconnect_delay=2.0, max_reconnects=-1):
+        self.source = source
+        self.simulate = simulate
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnects = max_reconnects
+        self.cap = self._open()
+        if not self.cap.isOpened():
+            raise IOError(f"Não foi possível abrir o stream {source}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.frames_read = 0
+        self.frames_decoded = 0
+        self.frames_dropped = 0
+        self.reconnects = 0
+        self.decode_s = Timings()
+        self.start_wall = time.time()
+        self._cond = threading.Condition()
+        self._latest = None
+        self._ended = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="live-capture", daemon=True)
+        self._thread.start()
+
+    def _open(self):
+        src = self.source
+        return cv2.VideoCapture(int(src) if str(src).isdigit() else src)
+
+    def _reconnect(self):
+        if self.simulate or 0 <= self.max_reconnects <= self.reconnects:
+            return False
+        print(f"[ERRO] Stream {self.source} perdido; reconectando em {self.reconnect_delay:.0f}s")
+        self.cap.release()
+        if self._stop.wait(self.reconnect_delay):
+            return False
+        self.cap = self._open()
+        self.reconnects += 1
+        if self.cap.isOpened():
+            print(f"[INFO] Stream {self.source} reconectado")
+        return True
+
+    def _run(self):
+        interval = 1.0 / (self.fps if self.fps and self.fps > 0 else 30.0)
+        try:
+            while not self._stop.is_set():
+                t0 = now()
+                ok, frame = self.cap.read()
+                if not ok:
+                    if self._reconnect():
+                        continue
+                    break
+                self.decode_s.since(t0)
+                if self.simulate:
+                    # Frame n "chega" em start_wall + n / FPS
+                    wait = self.start_wall + self.frames_decoded * interval - time.time()
+                    if wait > 0 and self._stop.wait(wait):
+                        break
+                item = (self.frames_decoded, (time.time() - self.start_wall) * 1000.0, frame)
+                self.frames_decoded += 1
+                with self._cond:
+                    if self._latest is not None:
+                        self.frames_dropped += 1
+                    self._latest = item
+                    self._cond.notify()
+        finally:
+            with self._cond:
+                self._ended = True
+                self._cond.notify()
+
+    def __iter__(self):
+        while True:
+            with self._cond:
+                while self._latest is None and not self._ended and not self._stop.is_set():
+                    self._cond.wait(0.1)
+                item, self._latest = self._latest, None
+            if item is None:
+                return
+            self.frames_read += 1
+            yield item
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.cap.release()